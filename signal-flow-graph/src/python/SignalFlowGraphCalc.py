@@ -1,537 +1,516 @@
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
 import threading
-import matplotlib.pyplot as plt
-import networkx as nx
-from flask import Flask, jsonify, request
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import sympy as sp
-from itertools import combinations
+from analysis_cache import AnalysisCache, analysis_key
+from mason import (ENGINES, AnalysisSession, AnalysisTimeout, EnumerationLimits, StageTimings, analyze_batch,
+                   analyze_parts_one, check_values, complete_analysis, iter_analysis, load_analysis_modules)
+from metrics import AnalysisMetrics
+from response_format import check_shape, decode_body, encode_body, negotiate, shape_result
+from result_store import ResultStore
+from routh import parse_coefficients, routh_sweep, routh_table
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-def build_graph(nodes, edges):
-    G = nx.MultiDiGraph()  # Use MultiDiGraph to allow parallel edges
-    for node in nodes:
-        G.add_node(node['id'])
-    for i, edge in enumerate(edges):
-        weight = sp.sympify(edge['label'])
-        print(weight)
-        print(i)
-        G.add_edge(edge['source'], edge['target'], weight=weight, id=f"edge_{i}")
-    return G
-def get_edge_weight_by_id(G, edge_id):
-    # Iterate through all edges in the graph (with keys, if it's a MultiDiGraph)
-    for u, v, key, data in G.edges(data=True, keys=True):
-        # Check if the edge's id matches the given id
-        if data.get('id') == edge_id:
-            # Return the weight of the edge
-            return data.get('weight')  # or use the key to get other attributes if needed
-    return None  # Return None if the edge with the given id was not found
-
-def draw_graph(G):
-    print("\nGraph Structure:")
-    print("Nodes:")
-    for node in G.nodes:
-        print(f"  {node}")
-    
-    print("Edges:")
-    for u, v, data in G.edges(data=True):
-        print(f"  {u} -> {v}  (weight = {data['weight']})")
-    # Visualization code commented out as in original
-
-def find_forward_paths(G, source, sink, path=None, edge_used=None, all_paths=None):
-    if path is None:
-        path = []
-    if edge_used is None:
-        edge_used = []
-    if all_paths is None:
-        all_paths = []
-    
-    path = path + [source]
-    
-    if source == sink:
-        all_paths.append({"path": path.copy(), "edges_used": edge_used.copy()})
-        return all_paths
-    
-    # Get all outgoing edges
-    for u, v, edge_data in G.out_edges(source, data=True):
-        if v not in path:  # Avoid cycles
-            new_edge_used = edge_used + [edge_data['id']]
-            find_forward_paths(G, v, sink, path, new_edge_used, all_paths)
-    
-    return all_paths
-
-def find_unique_loops(G):
-    all_loops = []
-    all_gains = []
-    seen_loops = set()
-    
-    for start_node, second_node, key, data in G.edges(data=True, keys=True):
-        print(start_node)
-        print(second_node)
-        if(start_node==second_node):
-            path = [start_node,second_node]
-            gain = [data['id']]
-            cycle_key = tuple(sorted(path))
-            gain_values = tuple(sorted(gain))
-            unique_key = (cycle_key, gain_values)
-            if unique_key not in seen_loops:
-                seen_loops.add(unique_key)
-                all_loops.append(path)
-                all_gains.append(gain)
-            continue
-        visited = {start_node, second_node}
-        path = [start_node, second_node]
-        gain = [data['id']]
-        dfs_find_loops(G, second_node, start_node, visited, path, all_loops, seen_loops, gain, all_gains)
-    
-    # Create pairs of loops and gains for sorting
-    loop_gain_pairs = list(zip(all_loops, all_gains))
-    
-    # Sort pairs based on some criteria, for example, the first node in the loop
-    # You can change the sorting key based on your specific requirements
-    sorted_pairs = sorted(loop_gain_pairs, key=lambda x: (min(x[0]), len(x[0])))
-    
-    sorted_loops, sorted_gains = zip(*sorted_pairs) if loop_gain_pairs else ([], [])
-    gain_products = []
-    
-    # Iterate through each list of edge ids in sorted_gains
-    for edge_ids in sorted_gains:
-        gain_product = 1
-        for edge_id in edge_ids:
-            gain = get_edge_weight_by_id(G, edge_id)  # Get the gain for the edge id
-            gain_product *= gain  # Multiply the gains
-        
-        gain_products.append(gain_product)
-
-    return list(sorted_loops), list(gain_products)
-
-def dfs_find_loops(G, current, start_node, visited, path, all_loops, seen_loops, gain, all_gains):
-    for _, neighbor, key, data in G.out_edges(current, data=True, keys=True):
-        if neighbor == start_node:
-            current_cycle = path + [start_node]
-            current_gain = gain + [data['id']] 
-            canonical_cycle = canonicalize_cycle(current_cycle)
-            cycle_key = tuple(sorted(canonical_cycle))
-            gain_values = tuple(sorted(current_gain))
-            unique_key = (cycle_key, gain_values)
-            print(unique_key)
-            
-            if unique_key not in seen_loops:
-                seen_loops.add(unique_key)
-                all_loops.append(current_cycle)
-                all_gains.append(current_gain)
-        
-        elif neighbor not in visited:
-            visited.add(neighbor)
-            path.append(neighbor)
-            gain.append(data['id'])
-            dfs_find_loops(G, neighbor, start_node, visited, path, all_loops, seen_loops, gain, all_gains)
-            path.pop()
-            gain.pop()
-            visited.remove(neighbor)
-
-def canonicalize_cycle(cycle):
+# (result, TransferFunctionParts) of recent analyses, keyed by the canonical
+# hash of the graph and mode; gain values are applied per request
+ANALYSIS_CACHE = AnalysisCache(max_entries=256, max_bytes=64 * 1024 * 1024)
+
+# Per-stage timings and counts of every /analyze request, served on /metrics
+ANALYSIS_METRICS = AnalysisMetrics()
+
+# Worker processes for /analyze/batch (None: one per CPU) and the default
+# per-graph timeout in seconds
+BATCH_MAX_WORKERS = None
+BATCH_TIMEOUT = 60
+
+# /analyze computations that miss the cache run in ANALYSIS_WORKERS worker
+# processes (0: in the request thread) within ANALYSIS_BUDGET seconds. At
+# most MAX_CONCURRENT_ANALYSES run at once per server process; a request
+# waits up to ADMISSION_WAIT seconds for a slot and then gets a 503.
+ANALYSIS_WORKERS = int(os.environ.get('SFG_ANALYSIS_WORKERS', 0))
+ANALYSIS_BUDGET = float(os.environ.get('SFG_ANALYSIS_BUDGET', 30))
+MAX_CONCURRENT_ANALYSES = int(os.environ.get('SFG_MAX_CONCURRENT_ANALYSES', 4))
+ADMISSION_WAIT = 2
+MIN_ANALYSIS_BUDGET = 1
+ANALYSIS_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_ANALYSES)
+
+# On-disk store behind ANALYSIS_CACHE that survives restarts (SFG_STORE_PATH
+# names the SQLite file; unset: no store)
+RESULT_STORE = ResultStore(os.environ['SFG_STORE_PATH']) if os.environ.get('SFG_STORE_PATH') else None
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    try:
+        data = decode_body(request.get_data(), request.content_type, request.content_encoding)
+        check_shape(data)
+        if data.get('engine', 'auto') not in ENGINES:
+            raise ValueError(f"Unknown engine {data['engine']!r} (expected one of {', '.join(ENGINES)})")
+        request_budget(data)
+        EnumerationLimits.from_request(data)
+        if data.get('values'):
+            check_values(data['values'])
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    stream = data.get('stream')
+    key, entry, timings = lookup_analysis(data)
+    if entry is None and not admit_analysis():
+        return too_busy()
+    # Releases the slot when done, or when a streaming client disconnects
+    events = analysis_events(data, key, entry, timings)
+    if not stream:
+        analysis_result = None
+        try:
+            for event, payload in events:
+                if event == "result":
+                    analysis_result = payload
+        except ValueError as e:
+            # Labels that do not parse, or node equations that are singular
+            return jsonify(error=str(e)), 400
+        return negotiated_response({"result": shape_result(analysis_result, data)})
+
+    def ndjson():
+        for event, payload in events:
+            if event == "result":
+                line = {"event": event, "result": shape_result(payload, data)}
+            else:
+                line = {"event": event, **payload}
+            yield json.dumps(line) + "\n"
+
+    def server_sent_events():
+        for event, payload in events:
+            if event == "result":
+                payload = shape_result(payload, data)
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    # Paths and loops are sent as they are found, the full result last
+    if stream == 'sse':
+        return Response(server_sent_events(), mimetype='text/event-stream')
+    return Response(ndjson(), mimetype='application/x-ndjson')
+
+def negotiated_response(body):
     """
-    Convert cycle to canonical form (starting with lexicographically smallest node)
+    Response with body serialized and compressed as the request's Accept and
+    Accept-Encoding headers prefer (JSON and uncompressed by default)
     """
-    cycle = cycle[:-1]
-    min_node = min(cycle)
-    min_idx = cycle.index(min_node)
-    canonical = cycle[min_idx:] + cycle[:min_idx] + [min_node]
-    return canonical
+    mimetype, encoding = negotiate(request.accept_mimetypes, request.accept_encodings)
+    data, encoding = encode_body(body, mimetype, encoding)
+    response = Response(data, mimetype=mimetype)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    return response
+
+def admit_analysis():
+    """Take one of ANALYSIS_SLOTS, waiting up to ADMISSION_WAIT; False if none freed up"""
+    if ANALYSIS_SLOTS.acquire(timeout=ADMISSION_WAIT):
+        return True
+    ANALYSIS_METRICS.count("rejected")
+    return False
+
+def too_busy():
+    return jsonify(error="Too many analyses are running, retry shortly"), 503, {"Retry-After": "1"}
 
-def calculate_path_gain(G, path, edges_used=None):
+def lookup_analysis(data):
+    """Cache key, cached (result, parts) or None, and the request's StageTimings"""
+    key = analysis_key(data)
+    timings = StageTimings()
+    start = time.perf_counter()
+    entry = ANALYSIS_CACHE.get(key)
+    timings.add("cache_lookup", time.perf_counter() - start)
+    if entry is None and RESULT_STORE is not None:
+        start = time.perf_counter()
+        entry = RESULT_STORE.get(key)
+        timings.add("store_lookup", time.perf_counter() - start)
+        if entry is not None:
+            ANALYSIS_CACHE.put(key, entry)
+    return key, entry, timings
+
+def analysis_events(data, key, entry, timings):
     """
-    Calculate the gain of a path, optionally using specific edges identified by their IDs.
+    Serve one /analyze payload as (event, payload) pairs: "path" and "loop"
+    while they are enumerated (only when computed in the request thread),
+    then ("result", result). entry is the cached (result, parts), or None
+    when the caller holds an ANALYSIS_SLOTS slot, which is released here.
+
+    Path and loop enumeration gets half of the request's budget (see
+    request_budget) as its deadline, so a graph with too many of them still
+    gives a partial, truncated result. In worker processes the whole
+    computation is stopped at the budget and a "too_complex" result is
+    returned instead. Errors after streaming has started are reported as an
+    "error" event, since the response status has already been sent.
     """
-    gain = 1
-    
-    if edges_used and isinstance(edges_used, list):
-        # If we have specific edges to use
-        edge_idx = 0
-        for i in range(len(path) - 1):
-            # Get all edges between these nodes
-            edge_data = G.get_edge_data(path[i], path[i + 1])
-            
-            # Find the specific edge we want to use
-            edge_id = edges_used[edge_idx]
-            
-            found = False
-            for key, edge in edge_data.items():
-                if edge.get('id') == edge_id:
-                    gain *= edge['weight']
-                    found = True
-                    break
-            
-            if not found:
-                # If edge not found, use the first one (fallback)
-                gain *= edge_data[0]['weight']
-            
-            edge_idx += 1
-    else:
-        # Traditional approach - use first edge when multiple exist
-        for i in range(len(path) - 1):
-            edge_data = G.get_edge_data(path[i], path[i + 1])
-            
-            if isinstance(edge_data, dict):
-                # For MultiDiGraph, edge_data is a dict with keys as edge indices
-                if len(edge_data) > 0:
-                    edge = edge_data[0]  # Use the first edge by default
-                    gain *= edge['weight']
-            else:
-                # For simple graphs where edge_data is not a dict
-                gain *= edge_data['weight']
-    
-    return gain
-
-def are_touching(loop1, loop2):
-    """Check if two loops share any nodes"""
-    # Remove the duplicate end node for comparison
-    set1 = set(loop1[:-1])
-    set2 = set(loop2[:-1])
-    return bool(set1.intersection(set2))
-
-def calculate_determinant(G, loops, loop_mapping=None):
-    """Calculate the determinant Δ using Mason's formula with optimized non-touching loop detection"""
-    # If no loops, determinant is 1
-    if not loops:
-        return 1
-    
-    # Calculate individual loop gains
-    loop_gains = [calculate_path_gain(G, loop) for loop in loops]
-    
-    # Find all non-touching loop pairs
-    non_touching_pairs = []
-    for i, j in combinations(range(len(loops)), 2):
-        if not are_touching(loops[i], loops[j]):
-            non_touching_pairs.append((i, j))
-    
-    # Find all higher-order non-touching combinations hierarchically
-    all_non_touching_groups = {2: non_touching_pairs}
-    
-    # For orders 3 and above
-    for order in range(3, len(loops) + 1):
-        non_touching_n = []
-        
-        # For each potential loop to add to existing groups of order-1
-        for group in all_non_touching_groups[order-1]:
-            for idx in range(len(loops)):
-                # Skip if idx is already in the group
-                if idx in group:
-                    continue
-                
-                # Check if idx forms a non-touching pair with every element in the group
-                is_valid = True
-                for existing_idx in group:
-                    if (min(idx, existing_idx), max(idx, existing_idx)) not in non_touching_pairs:
-                        is_valid = False
-                        break
-                
-                if is_valid:
-                    # Create a new group with idx added
-                    new_group = tuple(sorted(group + (idx,)))
-                    if new_group not in non_touching_n:
-                        non_touching_n.append(new_group)
-        
-        # If no groups of this order exist, we can stop
-        if not non_touching_n:
-            break
-            
-        all_non_touching_groups[order] = non_touching_n
-    
-    if loop_mapping:
-        # Create symbolic representation
-        terms = ["1"]  # Start with 1
-        
-        # First-order terms: -L1, -L2, etc.
-        for i, gain in enumerate(loop_gains):
-            loop_symbol = loop_mapping[i]
-            terms.append(f"-{loop_symbol}")
-        
-        # Add higher-order terms with appropriate signs
-        for order, groups in all_non_touching_groups.items():
-            sign = "+" if order % 2 == 0 else "-"  # + for even, - for odd orders
-            for group in groups:
-                term = f"{sign}{loop_mapping[group[0]]}"
-                for idx in group[1:]:
-                    term += f"*{loop_mapping[idx]}"
-                terms.append(term)
-        
-        # Join all terms to form the determinant expression
-        delta_expr = " ".join(terms)
-        
-        # Calculate numeric value
-        numeric_delta = 1
-        numeric_delta -= sum(loop_gains)
-        
-        for order, groups in all_non_touching_groups.items():
-            sign = 1 if order % 2 == 0 else -1  # +1 for even, -1 for odd orders
-            for group in groups:
-                product = 1
-                for idx in group:
-                    product *= loop_gains[idx]
-                numeric_delta += sign * product
-        
-        return {
-            "expression": delta_expr,
-            "numeric_value": sp.simplify(numeric_delta)
-        }
-    else:
-        # Calculate numeric determinant
-        delta = 1
-        delta -= sum(loop_gains)
-        
-        for order, groups in all_non_touching_groups.items():
-            sign = 1 if order % 2 == 0 else -1  # +1 for even, -1 for odd orders
-            for group in groups:
-                product = 1
-                for idx in group:
-                    product *= loop_gains[idx]
-                delta += sign * product
-        
-        return sp.simplify(delta)
-
-def calculate_path_determinant(G, path, loops, loop_mapping=None):
-    """Calculate determinant Δₖ for a specific forward path using optimized approach"""
-    # Find loops that touch this path
-    path_nodes = set(path)
-    non_touching_indices = []
-    
-    for i, loop in enumerate(loops):
-        loop_nodes = set(loop[:-1])  # Exclude duplicate end node
-        if not path_nodes.intersection(loop_nodes):
-            non_touching_indices.append(i)
-    
-    # Create a subset of non-touching loops
-    non_touching_loops = [loops[i] for i in non_touching_indices]
-    
-    # Create a mapping for non-touching loops if needed
-    if loop_mapping:
-        non_touching_mapping = {new_idx: loop_mapping[orig_idx] 
-                               for new_idx, orig_idx in enumerate(non_touching_indices)}
-        return calculate_determinant(G, non_touching_loops, non_touching_mapping)
-    else:
-        # Calculate determinant with just these non-touching loops
-        return calculate_determinant(G, non_touching_loops)
-
-def create_transfer_function_expression(G, forward_paths_info, loops, path_mapping, loop_mapping):
-    """Create a symbolic transfer function expression using P1, P2, etc. and L1, L2, etc."""
-    # Calculate path gains
-    path_gains = []
-    for i, path_info in enumerate(forward_paths_info):
-        path = path_info["path"]
-        edges_used = path_info.get("edges_used")
-        gain = calculate_path_gain(G, path, edges_used)
-        path_gains.append(gain)
-    
-    # Calculate the main determinant expression
-    main_delta = calculate_determinant(G, loops, loop_mapping)
-    
-    # Calculate path determinants for each forward path
-    path_determinants = []
-    for path_info in forward_paths_info:
-        path = path_info["path"]
-        path_determinants.append(calculate_path_determinant(G, path, loops, loop_mapping))
-    
-    # Create the transfer function expression
-    numerator_terms = []
-    for i, (path_gain, path_det) in enumerate(zip(path_gains, path_determinants)):
-        path_symbol = path_mapping[i]
-        if isinstance(path_det, dict):  # If we have a symbolic expression
-            if path_det["expression"] == "1":  # If determinant is 1
-                numerator_terms.append(f"{path_symbol}")
-            else:
-                numerator_terms.append(f"{path_symbol}*({path_det['expression']})")
-        else:
-            if path_det == 1:  # If determinant is 1
-                numerator_terms.append(f"{path_symbol}")
-            else:
-                numerator_terms.append(f"{path_symbol}*{path_det}")
-    
-    numerator_expr = " + ".join(numerator_terms)
-    
-    if isinstance(main_delta, dict):  # If we have a symbolic expression
-        if main_delta["expression"] == "1":  # If main determinant is 1
-            transfer_function_expr = numerator_expr
-        else:
-            transfer_function_expr = f"({numerator_expr})/({main_delta['expression']})"
-    else:
-        if main_delta == 1:  # If main determinant is 1
-            transfer_function_expr = numerator_expr
-        else:
-            transfer_function_expr = f"({numerator_expr})/({main_delta})"
-    
-    # Also calculate the numeric value
-    numeric_tf = 0
-    for i, path_info in enumerate(forward_paths_info):
-        path = path_info["path"]
-        edges_used = path_info.get("edges_used")
-        path_gain = calculate_path_gain(G, path, edges_used)
-        path_det = calculate_path_determinant(G, path, loops)
-        if isinstance(path_det, dict):
-            path_det = path_det["numeric_value"]
-        numeric_tf += path_gain * path_det
-    
-    numeric_delta = main_delta
-    if isinstance(numeric_delta, dict):
-        numeric_delta = numeric_delta["numeric_value"]
-    
-    if numeric_delta != 1:
-        numeric_tf = numeric_tf / numeric_delta
-    
-    return {
-        "expression": transfer_function_expr,
-        "numeric_value": sp.simplify(numeric_tf)
-    }
-
-def calculate_transfer_function(G, forward_paths_info, loops, path_mapping=None, loop_mapping=None):
-    """Calculate transfer function using Mason's Gain Formula"""
-    if path_mapping and loop_mapping:
-        return create_transfer_function_expression(G, forward_paths_info, loops, path_mapping, loop_mapping)
-    
-    # Calculate the main determinant (Δ)
-    delta = calculate_determinant(G, loops)
-    
-    # Calculate the numerator terms (Pₖ × Δₖ)
-    numerator = 0
-    for path_info in forward_paths_info:
-        path = path_info["path"]
-        edges_used = path_info.get("edges_used")
-        path_gain = calculate_path_gain(G, path, edges_used)
-        path_determinant = calculate_path_determinant(G, path, loops)
-        numerator += path_gain * path_determinant
-    
-    # Transfer function is T = (∑ Pₖ × Δₖ) / Δ
-    if delta == 1:
-        return sp.simplify(numerator)
-    else:
-        return sp.simplify(numerator / delta)
-
-
-def calculate_forward_path_gains(G, paths_info, path_mapping=None):
-    """Calculate gains for all forward paths with specific edges"""
-    path_gains = []
-    for i, path_info in enumerate(paths_info):
-        path = path_info["path"]
-        edges_used = path_info.get("edges_used")
-        gain = calculate_path_gain(G, path, edges_used)
-        path_id = path_mapping[i] if path_mapping else f"Path {i+1}"
-        path_gains.append({
-            "id": path_id,
-            "path": path,
-            "gain": str(gain)
-        })
-    return path_gains
-
-def format_path_for_display(path):
-    """Format a path as a string like S1->S2->S3"""
-    return "->".join(path)
+    cached = entry is not None
+    try:
+        budget = request_budget(data)
+        # An explicit deadline of 0 is kept: it stops enumeration at once
+        deadline = data.get('deadline')
+        payload = dict(data, deadline=budget / 2 if deadline is None else min(float(deadline), budget / 2))
+        if not cached and ANALYSIS_WORKERS and not data.get('stream'):
+            entry = run_in_worker(payload, budget, timings)
+            if entry is None:
+                ANALYSIS_METRICS.count("too_complex")
+                yield "result", {"too_complex": True,
+                                 "error": f"The graph could not be analyzed within {budget}s"}
+                return
+        elif not cached:
+            steps = iter_analysis(
+                payload.get('nodes', []), payload.get('edges', []),
+                payload.get('sourceNode', 'S1'), payload.get('destNode', 'S4'),
+                fast=payload.get('mode', 'full') == 'fast', limits=EnumerationLimits.from_request(payload),
+                engine=payload.get('engine', 'auto')
+            )
+            while entry is None:
+                with timings.activate():
+                    event, step = next(steps)
+                if event == "result":
+                    entry = step
+                else:
+                    yield event, step
+        # A truncated result depends on the deadline, so it is not kept
+        if not cached and entry[1] is not None:
+            ANALYSIS_CACHE.put(key, entry)
+        # Evaluation, stability and frequency response reuse the cached evaluator and coefficients
+        with timings.activate():
+            analysis_result = complete_analysis(*entry, data.get('values'), data.get('stability'),
+                                                data.get('frequency_response'))
+        # Stored after completing, so coefficients computed for "stability" and
+        # "frequency_response" are kept too
+        if not cached and entry[1] is not None and RESULT_STORE is not None:
+            RESULT_STORE.put(key, entry)
+    except Exception as e:
+        if not data.get('stream'):
+            raise
+        logger.exception("Streaming analysis failed")
+        yield "error", {"error": f"{type(e).__name__}: {e}"}
+        return
+    finally:
+        if not cached:
+            ANALYSIS_SLOTS.release()
+    ANALYSIS_METRICS.observe(timings, cached)
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
+    if data.get('timings'):
+        # Timings belong to this request only, so they are never cached
+        analysis_result = dict(analysis_result, timings=dict(timings.as_dict(), cached=cached))
+    yield "result", analysis_result
+
+def request_budget(data):
+    """
+    Seconds /analyze may spend on a payload: its "budget", kept between
+    MIN_ANALYSIS_BUDGET and ANALYSIS_BUDGET. Raises ValueError if it is not
+    a number.
+    """
+    budget = data.get('budget')
+    if not budget:
+        return ANALYSIS_BUDGET
+    try:
+        budget = float(budget)
+    except (TypeError, ValueError):
+        raise ValueError(f"budget is a number of seconds, not {budget!r}") from None
+    if math.isnan(budget):
+        raise ValueError("budget is a number of seconds, not NaN")
+    return max(min(budget, ANALYSIS_BUDGET), MIN_ANALYSIS_BUDGET)
+
+def run_in_worker(payload, budget, timings):
+    """
+    Compute (result, parts) for payload in an analysis worker process, or
+    return None if it takes longer than budget. The worker stops itself at
+    the budget; if it does not answer shortly after, its pool is retired.
+    """
+    executor = ANALYSIS_POOL.get(ANALYSIS_WORKERS)
+    future = executor.submit(analyze_parts_one, payload, budget)
+    try:
+        entry, worker_timings = future.result(timeout=budget + 5)
+    except AnalysisTimeout:
+        return None
+    except FutureTimeout:
+        logger.warning("Analysis worker did not stop at its %ss budget; replacing the pool", budget)
+        ANALYSIS_POOL.retire(executor)
+        return None
+    except BrokenProcessPool:
+        ANALYSIS_POOL.retire(executor)
+        raise
+    timings.merge(worker_timings)
+    return entry
+
+class WorkerPool:
+    """
+    Shared process pool, created on first use with all of its workers
+    started and the analysis modules imported in each, so no request pays
+    for the imports (or has its deadline cut into by them). A pool with a
+    stuck or dead worker is retired: new work goes to a fresh pool while the
+    analyses still running on the old one finish, and only then are its
+    remaining processes stopped.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self, max_workers=None):
+        with self._lock:
+            if self._executor is None:
+                self._executor = TrackedExecutor(max_workers)
+                # Workers start on demand; give each one something to start for
+                for _ in range(self._executor.max_workers):
+                    self._executor.submit(load_analysis_modules)
+            return self._executor
+
+    def retire(self, executor, grace=None):
+        """
+        Stop handing out executor, if it is still the current pool (other
+        requests that saw the same failure do not retire its replacement).
+        Its in-flight work gets grace seconds (default: the analysis budget
+        plus a margin) to finish before its processes are terminated.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        grace = ANALYSIS_BUDGET + 5 if grace is None else grace
+        threading.Thread(target=self._drain, args=(executor, grace), daemon=True).start()
+
+    @staticmethod
+    def _drain(executor, grace):
+        executor.shutdown(wait=False)
+        wait(executor.pending(), timeout=grace)
+        # Whatever is still running is stuck; it must not linger
+        pids = executor.worker_pids()
+        for process in multiprocessing.active_children():
+            if process.pid in pids:
+                process.terminate()
+
+class TrackedExecutor:
+    """
+    ProcessPoolExecutor that keeps its unfinished futures and the process
+    ids of its workers, so a retired pool can be drained and stopped
+    without reaching into the executor's internals
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._started = multiprocessing.SimpleQueue()  # pids reported by start_worker
+        self._pids = set()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=start_worker,
+                                             initargs=(self._started,))
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def pending(self):
+        """Futures submitted here that have not finished yet"""
+        with self._lock:
+            return list(self._pending)
+
+    def worker_pids(self):
+        """Process ids of the workers started so far"""
+        while not self._started.empty():
+            self._pids.add(self._started.get())
+        return set(self._pids)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+def start_worker(started):
+    """Pool initializer: report the worker's pid, then import the analysis modules"""
+    started.put(os.getpid())
+    load_analysis_modules()
+
+ANALYSIS_POOL = WorkerPool()
+BATCH_POOL = WorkerPool()
+
+def get_batch_executor():
+    """Shared process pool for /analyze/batch"""
+    return BATCH_POOL.get(BATCH_MAX_WORKERS)
+
+def batch_timeout(data):
+    """
+    Seconds each graph of an /analyze/batch payload may take: its "timeout",
+    at most BATCH_TIMEOUT (which is also used when it is unset or null).
+    Raises ValueError if it is not a positive number.
+    """
+    timeout = data.get('timeout')
+    if timeout is None:
+        return BATCH_TIMEOUT
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError(f"timeout is a number of seconds, not {timeout!r}") from None
+    if not timeout > 0:
+        raise ValueError(f"timeout must be positive, not {timeout!r}")
+    return min(timeout, BATCH_TIMEOUT)
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch_route():
     data = request.get_json()
-    nodes = data.get('nodes', [])
-    edges = data.get('edges', [])
-    source = data.get('sourceNode', 'S1')
-    sink = data.get('destNode', 'S4')
-    print(source)
-    print(sink)
-
-    G = build_graph(nodes, edges)
-    draw_graph(G)
-
-    # Find forward paths with edge information
-    forward_paths_info = find_forward_paths(G, source, sink)
-    
-    # Extract just the paths for certain operations
-    forward_paths = [info["path"] for info in forward_paths_info]
-
-    loops ,loop_gains= find_unique_loops(G)
-    print(loops)
-    print(loop_gains)
-    
-    # Create mappings for paths and loops
-    path_mapping = {i: f"P{i+1}" for i in range(len(forward_paths_info))}
-    loop_mapping = {i: f"L{i+1}" for i in range(len(loops))}
-    
-    # Print paths with their labels
-    print("\nForward Path Mapping:")
-    for i, path_info in enumerate(forward_paths_info):
-        print(f"{path_mapping[i]}: {format_path_for_display(path_info['path'])}")
-    
-    # Print loops with their labels
-    print("\nLoop Mapping:")
-    for i, loop in enumerate(loops):
-        print(f"{loop_mapping[i]}: {format_path_for_display(loop[:-1] + [loop[-1]])}")
-
-    # Calculate detailed information
-    forward_path_gains = calculate_forward_path_gains(G, forward_paths_info, path_mapping)
-     
-    
-    # Calculate determinant with symbolic mapping
-    determinant = calculate_determinant(G, loops, loop_mapping)
-    print(f"\nDeterminant (Δ): {determinant['expression'] if isinstance(determinant, dict) else determinant}")
-    
-    # Calculate path determinants
-    path_determinants = []
-    for i, path_info in enumerate(forward_paths_info):
-        path = path_info["path"]
-        delta_k = calculate_path_determinant(G, path, loops, loop_mapping)
-        path_determinants.append({
-            "path_id": path_mapping[i],
-            "path": path,
-            "determinant": delta_k['expression'] if isinstance(delta_k, dict) else str(delta_k)
-        })
-        print(f"Path Determinant for {path_mapping[i]}: {delta_k['expression'] if isinstance(delta_k, dict) else delta_k}")
-
-    # Calculate transfer function with symbolic mapping
-    transfer_function = calculate_transfer_function(G, forward_paths_info, loops, path_mapping, loop_mapping)
-    if isinstance(transfer_function, dict):
-        tf_expression = transfer_function["expression"]
-        tf_numeric = str(transfer_function["numeric_value"])
-    else:
-        tf_expression = str(transfer_function)
-        tf_numeric = str(transfer_function)
-    print(f'\nTransfer Function: {tf_expression}')
-    print(f'Numeric Value: {tf_numeric}')
-    loop_gains_str = [str(gain) for gain in loop_gains]
-    print("FFFFFF")
-    print(loop_gains_str)
-
-    analysis_result = {
-        "forward_paths": [
-            {
-                "id": path_mapping[i],
-                "nodes": path_info["path"],
-                "display": format_path_for_display(path_info["path"])
-            } for i, path_info in enumerate(forward_paths_info)
-        ],
-        "forward_path_gains": forward_path_gains,
-        "loops": [
-            {
-                "id": loop_mapping[i],
-                "nodes": loop,
-                "display": format_path_for_display(loop[:-1] + [loop[-1]])
-            } for i, loop in enumerate(loops)
-        ],
-        "loop_gains": loop_gains_str,
-        "determinant": {
-            "expression": determinant['expression'] if isinstance(determinant, dict) else str(determinant),
-            "numeric_value": str(determinant['numeric_value'] if isinstance(determinant, dict) else determinant)
-        },
-        "path_determinants": path_determinants,
-        "transfer_function": {
-            "expression": tf_expression,
-            "numeric_value": str(tf_numeric)
-        }
-    }
-
-    return jsonify(result=analysis_result)
+    try:
+        if not isinstance(data, dict) or not isinstance(data.get('graphs', []), list):
+            raise ValueError("The request body is an object with a list of graphs")
+        timeout = batch_timeout(data)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    graphs = data.get('graphs', [])
+
+    def stream():
+        crashed = False
+        executor = get_batch_executor()
+        try:
+            for outcome in analyze_batch(graphs, timeout, executor=executor):
+                crashed = crashed or outcome.get("crashed", False)
+                yield json.dumps(outcome) + "\n"
+        except BrokenProcessPool:
+            crashed = True
+            yield json.dumps({"error": "Worker pool is broken", "crashed": True}) + "\n"
+        if crashed:
+            BATCH_POOL.retire(executor, grace=0)
+
+    # One JSON object per line, in the order the graphs finish
+    return Response(stream(), mimetype='application/x-ndjson')
+
+# Open editor sessions, least recently used first
+SESSIONS = OrderedDict()
+SESSIONS_LOCK = threading.Lock()
+MAX_SESSIONS = 128
+
+def get_session(session_id):
+    with SESSIONS_LOCK:
+        session = SESSIONS.get(session_id)
+        if session is not None:
+            SESSIONS.move_to_end(session_id)
+        return session
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    # Sessions analyze in the request thread, so they take a slot like /analyze
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify(error="The request body must be an object"), 400
+    if not admit_analysis():
+        return too_busy()
+    try:
+        session = AnalysisSession(data)
+    except KeyError as e:
+        return jsonify(error=f"Missing field: {e.args[0]}"), 400
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    finally:
+        ANALYSIS_SLOTS.release()
+    session_id = uuid.uuid4().hex
+    with SESSIONS_LOCK:
+        SESSIONS[session_id] = session
+        while len(SESSIONS) > MAX_SESSIONS:
+            SESSIONS.popitem(last=False)
+    return jsonify(session_id=session_id, result=session.result), 201
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session_result(session_id):
+    session = get_session(session_id)
+    if session is None:
+        return jsonify(error="Unknown session"), 404
+    return jsonify(session_id=session_id, result=session.result)
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    with SESSIONS_LOCK:
+        SESSIONS.pop(session_id, None)
+    return '', 204
+
+@app.route('/sessions/<session_id>/edges', methods=['PATCH'])
+def edit_session_edges(session_id):
+    session = get_session(session_id)
+    if session is None:
+        return jsonify(error="Unknown session"), 404
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify(error="The request body must be an object"), 400
+    edits = data.get('edits', [data])
+    if not isinstance(edits, list):
+        return jsonify(error="edits is a list of edge edits"), 400
+    if not admit_analysis():
+        return too_busy()
+    with session.lock:
+        # All or nothing: a failing edit leaves the session as it was
+        try:
+            added = session.apply_edits(edits)
+        except KeyError as e:
+            return jsonify(error=f"Unknown edge or missing field: {e.args[0]}"), 400
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        finally:
+            ANALYSIS_SLOTS.release()
+        return jsonify(session_id=session_id, added_edges=added, result=session.result)
+
+@app.route('/routh', methods=['POST'])
+def routh():
+    data = request.get_json()
+    try:
+        coefficients = parse_coefficients(data.get('coefficients'), data.get('polynomial'),
+                                          data.get('variable', 's'))
+        if data.get('sweep'):
+            result = routh_sweep(coefficients, data['sweep'], data.get('epsilon', 1e-9))
+        else:
+            result = routh_table(coefficients)
+    except (ValueError, TypeError, SyntaxError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result=result)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify(status="ok", message="Signal Flow Graph API is running")
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    if RESULT_STORE is None:
+        return jsonify(cache=ANALYSIS_CACHE.stats())
+    return jsonify(cache=ANALYSIS_CACHE.stats(), store=RESULT_STORE.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(ANALYSIS_METRICS.render(ANALYSIS_CACHE.stats()),
+                    mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Signal flow graph analysis server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=ANALYSIS_WORKERS,
+                        help="analysis worker processes (0: analyze in the request thread)")
+    parser.add_argument('--store', help="SQLite file to keep analyses in across restarts")
+    parser.add_argument('--production', action='store_true',
+                        help="serve with waitress instead of the Flask debug server")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    ANALYSIS_WORKERS = args.workers
+    if ANALYSIS_WORKERS:
+        ANALYSIS_POOL.get(ANALYSIS_WORKERS)  # Start and warm up the workers before serving
+    if args.store:
+        RESULT_STORE = ResultStore(args.store)
+    if args.production:
+        # Multi-threaded WSGI server; for a pre-forked setup use gunicorn.conf.py instead
+        from waitress import serve
+        serve(app, host=args.host, port=args.port, threads=MAX_CONCURRENT_ANALYSES * 2)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
\ No newline at end of file
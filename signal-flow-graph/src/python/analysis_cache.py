@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+def graph_hash(nodes, edges, source, sink, options=None):
+    """
+    Content hash of an analysis request. Only what affects the result is
+    hashed (node ids, edge endpoints and labels, source, sink and options),
+    and nodes and edges are sorted first, so the hash does not depend on the
+    order the client listed them in or on layout fields such as positions.
+    """
+    canonical = {
+        "nodes": sorted(str(node['id']) for node in nodes),
+        "edges": sorted(
+            [str(edge['source']), str(edge['target']), str(edge['label']).strip()]
+            for edge in edges
+        ),
+        "source": source,
+        "sink": sink,
+        "options": options or {},
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def analysis_key(data):
+    """graph_hash of an /analyze payload, covering the options its cached (result, parts) depend on"""
+    options = {"mode": data.get('mode', 'full')}
+    for limit in ('max_paths', 'max_loops', 'engine'):
+        if data.get(limit) is not None:
+            options[limit] = data[limit]
+    return graph_hash(
+        data.get('nodes', []), data.get('edges', []),
+        data.get('sourceNode', 'S1'), data.get('destNode', 'S4'),
+        options
+    )
+
+class AnalysisCache:
+    """
+    Thread-safe LRU cache of analysis results keyed by graph_hash. Entries are
+    evicted least recently used first once either max_entries or max_bytes
+    (approximate size of the JSON-serialized results) is exceeded.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached result for key (marking it recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """Store result under key, evicting old entries to stay within bounds"""
+        size = len(json.dumps(result, default=str))
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return  # Would evict everything else and still not fit
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters and current usage, as exposed on /stats"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,57 @@
+"""
+Cold-start benchmark: wall time of fresh interpreters importing the engine,
+importing the Flask app and running the CLI on a small graph.
+
+    python benchmarks/bench_cold_start.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_GRAPH = {
+    "nodes": [{"id": f"S{i}"} for i in range(1, 5)],
+    "edges": [
+        {"source": "S1", "target": "S2", "label": "G1"},
+        {"source": "S2", "target": "S3", "label": "G2"},
+        {"source": "S3", "target": "S4", "label": "G3"},
+        {"source": "S3", "target": "S2", "label": "-H1"},
+    ],
+    "sourceNode": "S1",
+    "destNode": "S4",
+}
+
+CASES = [
+    ("interpreter only", [sys.executable, "-c", "pass"], None),
+    ("import mason", [sys.executable, "-c", "import mason"], None),
+    ("import SignalFlowGraphCalc", [sys.executable, "-c", "import SignalFlowGraphCalc"], None),
+    ("cli.py on a 4-node graph", [sys.executable, "cli.py"], json.dumps(SAMPLE_GRAPH)),
+]
+
+def time_command(command, stdin, runs):
+    """Median and minimum wall time in milliseconds over runs fresh processes"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=stdin, text=True, cwd=PYTHON_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<30} {'median ms':>10} {'min ms':>10}")
+    for name, command, stdin in CASES:
+        median, fastest = time_command(command, stdin, args.runs)
+        print(f"{name:<30} {median:>10.1f} {fastest:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Mason's formula pipeline benchmark: time and peak memory of each stage on
+synthetic graphs (see graph_generator.py) of growing size, compared with a
+baselines file, and every result cross-checked against a linear-equation
+reference solver.
+
+    python benchmarks/bench_mason.py                        # compare with baselines.json
+    python benchmarks/bench_mason.py --record               # (re)write baselines.json
+    python benchmarks/bench_mason.py --family dense --sizes 3 4 --labels numeric
+
+Exits 1 if a stage regressed by more than --tolerance or a result disagrees
+with the reference solver. Baselines are machine specific, so record them on
+the machine the comparison runs on.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import sympy as sp
+
+import elimination
+import mason
+from graph_generator import FAMILIES, generate
+
+DEFAULT_SIZES = {"cascade": [2, 4, 6], "ladder": [2, 4, 6], "dense": [3, 4]}
+DEFAULT_BASELINES = os.path.join(BENCH_DIR, "baselines.json")
+
+# Stage differences below these are noise, whatever the ratio
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_KB = 64.0
+
+def run_pipeline(payload, fast=False, memory=False, engine="mason"):
+    """
+    Run the pipeline stage by stage. Returns ({stage: ms}, or {stage: peak
+    KiB} with memory, the counts of paths/loops/groups, (numerator,
+    denominator) of the transfer function). engine="elimination" solves the
+    node equations instead of applying Mason's formula.
+    """
+    measurements = {}
+
+    def stage(name, function, *args, **kwargs):
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = function(*args, **kwargs)
+        if memory:
+            measurements[name] = (tracemalloc.get_traced_memory()[1] - before) / 1024
+        else:
+            measurements[name] = (time.perf_counter() - start) * 1000
+        return value
+
+    G = stage("build_graph", mason.build_graph, payload["nodes"], payload["edges"])
+    if engine == "elimination":
+        parts = stage("eliminate", elimination.eliminate, G, payload["sourceNode"], payload["destNode"])
+        return measurements, {"nodes": len(payload["nodes"])}, parts
+    paths = stage("find_forward_paths", mason.find_forward_paths, G, payload["sourceNode"], payload["destNode"])
+    loops, loop_gains = stage("find_unique_loops", mason.find_unique_loops, G)
+    model = stage("non_touching_groups", mason.LoopInteractionModel, G, loops, loop_gains, simplify=not fast)
+    stage("calculate_determinant", mason.calculate_determinant, G, loops, model=model)
+    transfer_function = stage("calculate_transfer_function", mason.calculate_transfer_function,
+                              G, paths, loops, model=model)
+
+    counts = {
+        "paths": len(paths),
+        "loops": len(loops),
+        "groups": sum(len(groups) for groups in model.groups.values()),
+    }
+    if isinstance(transfer_function, dict):
+        parts = transfer_function["numerator"], transfer_function["denominator"]
+    else:
+        parts = transfer_function, 1
+    return measurements, counts, parts
+
+def reference_transfer_function(payload, values):
+    """
+    Exact x_sink / u at the given gain values from the node equations
+    x = A·x + b·u, where u is injected at the source node.
+    """
+    node_ids = [node["id"] for node in payload["nodes"]]
+    position = {node: i for i, node in enumerate(node_ids)}
+    A = sp.zeros(len(node_ids))
+    for edge in payload["edges"]:
+        A[position[edge["target"]], position[edge["source"]]] += sp.sympify(edge["label"]).subs(values)
+    b = sp.zeros(len(node_ids), 1)
+    b[position[payload["sourceNode"]]] = 1
+    x = (sp.eye(len(node_ids)) - A).LUsolve(b)
+    return sp.nsimplify(x[position[payload["destNode"]]])
+
+def cross_check(payload, parts, trials=3, seed=0):
+    """
+    Compare the transfer function with the reference solver at random
+    rational gain values (a symbolic mismatch shows up at almost every
+    point). Returns None if they agree, or a description of the mismatch.
+    """
+    numerator, denominator = (sp.sympify(part) for part in parts)
+    symbols = sorted(set().union(*(sp.sympify(edge["label"]).free_symbols for edge in payload["edges"])),
+                     key=str)
+    rng = random.Random(seed)
+    for _ in range(trials):
+        values = {s: sp.Rational(rng.choice([-1, 1]) * rng.randint(1, 9), rng.randint(1, 9)) for s in symbols}
+        mason_denominator = denominator.subs(values)
+        if mason_denominator == 0:
+            continue  # Singular point; the next draw tests the graph
+        expected = reference_transfer_function(payload, values)
+        actual = sp.nsimplify(numerator.subs(values) / mason_denominator)
+        if sp.simplify(actual - expected) != 0:
+            return f"Mason gives {actual}, the node equations {expected} at {values}"
+    return None
+
+def measure(payload, fast, repeat, engine="mason"):
+    """Best time per stage over repeat runs, then one traced run for peak memory"""
+    best = {}
+    for _ in range(repeat):
+        sp.core.cache.clear_cache()  # Every run starts from a cold sympy cache
+        timings, counts, parts = run_pipeline(payload, fast, engine=engine)
+        for name, ms in timings.items():
+            best[name] = min(ms, best.get(name, ms))
+    sp.core.cache.clear_cache()
+    tracemalloc.start()
+    try:
+        memory, _, _ = run_pipeline(payload, fast, memory=True, engine=engine)
+    finally:
+        tracemalloc.stop()
+    return {"stages_ms": best, "peak_kb": memory, "counts": counts}, parts
+
+def regressions(current, baseline, tolerance):
+    """(stage, what, current, baseline) for every stage that got worse than tolerance allows"""
+    found = []
+    for key, floor in (("stages_ms", MIN_REGRESSION_MS), ("peak_kb", MIN_REGRESSION_KB)):
+        for name, value in current[key].items():
+            base = baseline.get(key, {}).get(name)
+            if base is not None and value > base * (1 + tolerance) and value - base > floor:
+                found.append((name, key, value, base))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--family', nargs='+', choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument('--sizes', nargs='+', type=int, help="sizes for every family (default: per family)")
+    parser.add_argument('--labels', nargs='+', choices=["symbolic", "numeric"], default=["symbolic", "numeric"])
+    parser.add_argument('--fast', action='store_true', help="benchmark fast mode (no sympy.simplify)")
+    parser.add_argument('--engine', choices=["mason", "elimination"], default="mason")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baselines', default=DEFAULT_BASELINES)
+    parser.add_argument('--record', action='store_true', help="write the results as the new baselines")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown/growth as a fraction")
+    parser.add_argument('--no-check', action='store_true', help="skip the reference solver cross-check")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    # Warm up: the first run pays for sympy's lazily imported modules
+    run_pipeline(generate("cascade", 1, "symbolic"), args.fast, engine=args.engine)
+
+    results = {}
+    failed = False
+    print(f"{'case':<28} {'stage':<28} {'ms':>10} {'base ms':>10} {'peak KiB':>10}  note")
+    for family in args.family:
+        for n in args.sizes or DEFAULT_SIZES[family]:
+            for labels in args.labels:
+                case = f"{family}/{n}/{labels}" + ("/fast" if args.fast else "")
+                if args.engine != "mason":
+                    case += f"/{args.engine}"
+                payload = generate(family, n, labels)
+                result, parts = measure(payload, args.fast, args.repeat, args.engine)
+                results[case] = result
+
+                flagged = {name: what for name, what, _, _ in regressions(result, baselines.get(case, {}),
+                                                                          args.tolerance)}
+                base_ms = baselines.get(case, {}).get("stages_ms", {})
+                for name, ms in result["stages_ms"].items():
+                    base = f"{base_ms[name]:.2f}" if name in base_ms else "-"
+                    note = f"REGRESSION ({flagged[name]})" if name in flagged else ""
+                    print(f"{case:<28} {name:<28} {ms:>10.2f} {base:>10} {result['peak_kb'][name]:>10.1f}  {note}")
+                failed = failed or bool(flagged)
+
+                counts = ", ".join(f"{kind} {count}" for kind, count in result["counts"].items())
+                if args.no_check:
+                    print(f"{case:<28} {counts}")
+                    continue
+                mismatch = cross_check(payload, parts)
+                print(f"{case:<28} {counts}; reference solver: {'MISMATCH ' + mismatch if mismatch else 'ok'}")
+                failed = failed or mismatch is not None
+
+    if args.record:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines written to {args.baselines}")
+    return 1 if failed and not args.record else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
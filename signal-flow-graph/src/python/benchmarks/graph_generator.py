@@ -0,0 +1,84 @@
+"""
+Synthetic signal flow graphs for benchmarks, as /analyze payloads.
+
+    cascade(n)  n first-order stages in series, each with its own feedback
+                loop; the loops never touch, so every subset of them is a
+                non-touching group (2**n determinant terms)
+    ladder(n)   n + 1 nodes in a chain with feedback between every adjacent
+                pair, the loop structure of an RC ladder network
+    dense(n)    n nodes with most node pairs coupled, parallel edges and
+                self-loops; paths and loops grow exponentially
+
+labels="symbolic" names every gain (G1, H2, ...); labels="numeric" uses
+small random integers and fractions instead.
+"""
+import random
+
+FAMILIES = ("cascade", "ladder", "dense")
+
+class _Labels:
+    """Hands out a fresh symbolic or numeric gain label for each edge"""
+
+    def __init__(self, labels, seed):
+        self.numeric = labels == "numeric"
+        self.random = random.Random(seed)
+        self.counts = {}
+
+    def __call__(self, prefix, sign=1):
+        if self.numeric:
+            numerator, denominator = self.random.choice([1, 2, 3, 5]), self.random.choice([1, 2, 4])
+            return f"{sign * numerator}/{denominator}" if denominator > 1 else str(sign * numerator)
+        self.counts[prefix] = self.counts.get(prefix, 0) + 1
+        name = f"{prefix}{self.counts[prefix]}"
+        return f"-{name}" if sign < 0 else name
+
+def _payload(node_ids, edges):
+    return {
+        "nodes": [{"id": node} for node in node_ids],
+        "edges": [{"source": u, "target": v, "label": label} for u, v, label in edges],
+        "sourceNode": node_ids[0],
+        "destNode": node_ids[-1],
+    }
+
+def cascade(n, labels="symbolic", seed=0):
+    label = _Labels(labels, seed)
+    node_ids = ["R"] + [f"X{i}" for i in range(1, 2 * n + 1)] + ["Y"]
+    edges = []
+    for stage in range(n):
+        inp, out = node_ids[2 * stage + 1], node_ids[2 * stage + 2]
+        edges.append((node_ids[2 * stage], inp, "1"))
+        edges.append((inp, out, label("G")))
+        edges.append((out, inp, label("H", -1)))
+    edges.append((node_ids[-2], node_ids[-1], "1"))
+    return _payload(node_ids, edges)
+
+def ladder(n, labels="symbolic", seed=0):
+    label = _Labels(labels, seed)
+    node_ids = ["R"] + [f"V{i}" for i in range(n + 1)] + ["Y"]
+    edges = [("R", "V0", "1")]
+    for i in range(n):
+        edges.append((f"V{i}", f"V{i + 1}", label("G")))
+        edges.append((f"V{i + 1}", f"V{i}", label("H", -1)))
+    edges.append((f"V{n}", "Y", "1"))
+    return _payload(node_ids, edges)
+
+def dense(n, labels="symbolic", seed=0, parallel=2, density=0.6):
+    """n inner nodes; each ordered pair is coupled with probability density by 1..parallel edges"""
+    label = _Labels(labels, seed)
+    rng = random.Random(seed)
+    inner = [f"N{i}" for i in range(n)]
+    node_ids = ["R"] + inner + ["Y"]
+    edges = [("R", inner[0], "1"), (inner[-1], "Y", "1")]
+    for i, u in enumerate(inner):
+        for j, v in enumerate(inner):
+            # The chain keeps R -> Y connected whatever the random draws
+            if j == i + 1 or (i != j and rng.random() < density):
+                for _ in range(rng.randint(1, parallel)):
+                    edges.append((u, v, label("A" if j > i else "B", 1 if j > i else -1)))
+        if rng.random() < density / 2:
+            edges.append((u, u, label("S", -1)))
+    return _payload(node_ids, edges)
+
+def generate(family, n, labels="symbolic", seed=0):
+    """The payload of the named family and size"""
+    return {"cascade": cascade, "ladder": ladder, "dense": dense}[family](n, labels, seed)
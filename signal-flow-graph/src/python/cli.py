@@ -0,0 +1,122 @@
+"""
+Analyze signal flow graphs from the command line.
+
+    python cli.py graph.json [more.json ...]
+    python cli.py < graph.json
+
+Each input holds an /analyze payload (nodes, edges, sourceNode, destNode)
+or a list of them. One JSON line is printed per graph.
+"""
+import argparse
+import json
+import logging
+import sys
+
+import mason
+from analysis_cache import analysis_key
+
+def read_payloads(files):
+    """Yield (name, payload) for every graph in the given files ('-' is stdin)"""
+    for name in files or ['-']:
+        if name == '-':
+            content = json.load(sys.stdin)
+            name = '<stdin>'
+        else:
+            with open(name) as f:
+                content = json.load(f)
+        if isinstance(content, list):
+            for i, payload in enumerate(content):
+                yield f"{name}[{i}]", payload
+        else:
+            yield name, content
+
+def analyze_with_store(payload, store, timeout=None):
+    """analyze_one, answering from the ResultStore when it has the graph and saving new analyses"""
+    key = analysis_key(payload)
+    try:
+        timings = mason.StageTimings()
+        entry = store.get(key)
+        computed = entry is None
+        if computed:
+            entry, timings = mason.analyze_parts_one(payload, timeout)
+        with timings.activate():
+            result = mason.complete_analysis(*entry, payload.get('values'), payload.get('stability'),
+                                             payload.get('frequency_response'))
+        if computed and entry[1] is not None:
+            store.put(key, entry)
+    except mason.AnalysisTimeout:
+        return {"error": f"Analysis exceeded the {timeout}s timeout", "timed_out": True}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if payload.get('timings'):
+        result = dict(result, timings=dict(timings.as_dict(), cached=not computed))
+    return {"result": result}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mason's gain formula analysis of signal flow graphs")
+    parser.add_argument('files', nargs='*', help="graph JSON files (default: read stdin)")
+    parser.add_argument('--fast', action='store_true',
+                        help="skip sympy.simplify and report the unsimplified numerator/denominator")
+    parser.add_argument('--values', type=json.loads,
+                        help="JSON object of gain symbol values to evaluate the transfer function at")
+    parser.add_argument('--stability', nargs='?', const='s', metavar='VARIABLE',
+                        help="run Routh stability on the characteristic polynomial in VARIABLE (default s)")
+    parser.add_argument('--frequency-response', type=json.loads, metavar='SPEC',
+                        help="JSON frequency grid, e.g. '{\"start\": 0.1, \"stop\": 1000, \"points\": 10000}', "
+                             "for Bode/Nyquist columns and poles/zeros")
+    parser.add_argument('--engine', choices=mason.ENGINES,
+                        help="mason's formula, node-equation elimination, or auto (pick by graph size)")
+    parser.add_argument('--max-paths', type=int, help="stop after this many forward paths")
+    parser.add_argument('--max-loops', type=int, help="stop after this many loops")
+    parser.add_argument('--deadline', type=float, help="seconds allowed for path and loop enumeration")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="analyze graphs on this many worker processes")
+    parser.add_argument('--timeout', type=float, help="per-graph timeout in seconds")
+    parser.add_argument('--store', help="SQLite result store to answer from and save to (graphs run in this process)")
+    parser.add_argument('--timings', action='store_true', help="include per-stage timings in each result")
+    parser.add_argument('--indent', type=int, help="pretty-print the output JSON")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="log progress to stderr (-vv for debug detail)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+                        stream=sys.stderr, format="%(levelname)s %(name)s: %(message)s")
+
+    names = []
+    payloads = []
+    for name, payload in read_payloads(args.files):
+        if args.fast:
+            payload['mode'] = 'fast'
+        if args.values is not None:
+            payload['values'] = args.values
+        if args.stability:
+            payload['stability'] = {"variable": args.stability}
+        for limit in ('max_paths', 'max_loops', 'deadline', 'engine'):
+            if getattr(args, limit) is not None:
+                payload[limit] = getattr(args, limit)
+        if args.frequency_response is not None:
+            payload['frequency_response'] = args.frequency_response
+        if args.timings:
+            payload['timings'] = True
+        names.append(name)
+        payloads.append(payload)
+
+    if args.store:
+        from result_store import ResultStore
+        store = ResultStore(args.store)
+        outcomes = [analyze_with_store(payload, store, args.timeout) for payload in payloads]
+        store.close()
+    elif args.workers:
+        outcomes = [None] * len(payloads)
+        for outcome in mason.analyze_batch(payloads, args.timeout, max_workers=args.workers):
+            outcomes[outcome.pop('index')] = outcome
+    else:
+        outcomes = [mason.analyze_one(payload, args.timeout) for payload in payloads]
+
+    failed = False
+    for name, outcome in zip(names, outcomes):
+        failed = failed or 'error' in outcome
+        print(json.dumps({"graph": name, **outcome}, indent=args.indent))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
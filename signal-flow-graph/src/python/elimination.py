@@ -0,0 +1,226 @@
+"""
+Transfer functions by solving the node equations x = A·x + b·u.
+
+Mason's formula needs every loop and every group of non-touching loops,
+which grows exponentially on large, highly coupled graphs. Solving
+(I - A)·x = b·u for the sink takes polynomial time instead. Symbolic gains
+are eliminated exactly by sparse, fraction-free Gaussian elimination on
+polynomials in the gain symbols; purely numeric gains use a sparse
+floating-point solve (SciPy if installed, otherwise NumPy). det(I - A) is
+Mason's Δ, and u is injected at the source node as in Mason's formula.
+"""
+import logging
+from lazy_modules import LazyModule
+from mason import TransferFunctionParts, edge_denominator, graph_index, record_count, timed_stage
+
+sp = LazyModule("sympy")
+np = LazyModule("numpy")
+
+logger = logging.getLogger(__name__)
+
+def node_matrix_entries(G):
+    """Nonzero entries of I - A as {(row, column): expression}, over node indices"""
+    index = graph_index(G)
+    entries = {(i, i): sp.Integer(1) for i in range(len(index.nodes))}
+    for u, v, weight in index.edges.values():
+        # Edge u -> v puts its gain in v's equation: x_v = ... + weight * x_u
+        key = (index.node_index[v], index.node_index[u])
+        entries[key] = entries.get(key, sp.Integer(0)) - weight
+    return {key: value for key, value in entries.items() if value != 0}
+
+def eliminate(G, source, sink):
+    """
+    Exact (numerator, denominator) of the transfer function from source to
+    sink, with denominator = det(I - A).
+
+    Each equation is first multiplied by the lcm of its entries' denominators,
+    so all arithmetic happens on polynomials. Nodes are then eliminated with
+    fraction-free (Bareiss) steps, where every division is exact and no gcd
+    is ever taken. The pivot at each step is the node whose elimination
+    creates the fewest new entries (Markowitz order), so sparse graphs stay
+    sparse. When every remaining diagonal entry is zero (a unity loop, or
+    one that cancels during elimination) an off-diagonal pivot is taken,
+    which swaps a row and a column; the sign of the determinant follows the
+    swaps. Raises ValueError if the node equations are singular.
+    """
+    index = graph_index(G)
+    entries = node_matrix_entries(G)
+    count = len(index.nodes)
+    source_index, sink_index = index.node_index[source], index.node_index[sink]
+    rhs_column = count  # b·u is kept as one more column of the system
+
+    # Floats are taken as the rationals they are written as, so divisions stay exact
+    fractions = {key: sp.fraction(sp.together(sp.nsimplify(value, rational=True) if value.has(sp.Float) else value))
+                 for key, value in entries.items()}
+    keys = list(fractions)
+    domain, polys = sp.construct_domain(
+        [part for key in keys for part in fractions[key]] + [sp.Integer(1)]
+    )
+    one = polys[-1]
+
+    # Scale every row by the lcm of its denominators (det(I - A) is divided by them again below)
+    row_denominators = [one] * count
+    for n, (i, _) in enumerate(keys):
+        row_denominators[i] = domain.lcm(row_denominators[i], polys[2 * n + 1])
+    rows = [{} for _ in range(count)]      # row -> {column: polynomial}
+    columns = [set() for _ in range(count + 1)]  # column -> rows with an entry in it
+    for n, (i, j) in enumerate(keys):
+        numerator, denominator = polys[2 * n], polys[2 * n + 1]
+        rows[i][j] = numerator * domain.exquo(row_denominators[i], denominator)
+        columns[j].add(i)
+    rows[source_index][rhs_column] = row_denominators[source_index]
+    columns[rhs_column].add(source_index)
+
+    def cost(pivot_row, pivot_column):
+        # Markowitz count of the entries eliminating at this pivot may fill in
+        return (len(rows[pivot_row]) - 1) * (len(columns[pivot_column]) - 1), pivot_row, pivot_column
+
+    previous_pivot = one
+    remaining_rows = set(range(count))
+    remaining_columns = set(range(count)) - {sink_index}  # x_sink is what is left to solve for
+    pivot_rows, pivot_columns = [], []
+    while remaining_columns:
+        diagonal = [(k, k) for k in remaining_columns & remaining_rows if rows[k].get(k)]
+        candidates = diagonal or [(i, j) for j in remaining_columns for i in columns[j]]
+        if not candidates:
+            raise ValueError("The node equations are singular (Δ = 0)")
+        pivot_row, k = min(candidates, key=lambda candidate: cost(*candidate))
+        pivot = rows[pivot_row][k]
+        row_k = rows[pivot_row]
+        for i in remaining_rows - {pivot_row}:
+            row_i = rows[i]
+            factor = row_i.pop(k, None)
+            columns[k].discard(i)
+            # Bareiss step: a_ij <- (a_kk a_ij - a_ik a_kj) / previous pivot, always exact
+            updated = {}
+            for j in (row_i.keys() | row_k.keys()) - {k} if factor else row_i:
+                value = pivot * row_i.get(j, domain.zero)
+                if factor and j in row_k:
+                    value -= factor * row_k[j]
+                if value:
+                    updated[j] = value if previous_pivot == one else domain.exquo(value, previous_pivot)
+                    columns[j].add(i)
+                elif j in row_i:
+                    columns[j].discard(i)
+            rows[i] = updated
+        for j in row_k:
+            columns[j].discard(pivot_row)
+        previous_pivot = pivot
+        remaining_rows.remove(pivot_row)
+        remaining_columns.remove(k)
+        pivot_rows.append(pivot_row)
+        pivot_columns.append(k)
+
+    # The last pivot is det of the scaled system with its rows and columns in
+    # pivot order; the right-hand side column holds the numerator of x_sink
+    # by Cramer's rule
+    last_row, = remaining_rows
+    determinant = rows[last_row].get(sink_index)
+    if not determinant:
+        raise ValueError("The node equations are singular (Δ = 0)")
+    sign = (_permutation_sign(pivot_rows + [last_row])
+            * _permutation_sign(pivot_columns + [sink_index]))
+    scale = sign * sp.Mul(*(domain.to_sympy(d) for d in row_denominators if d != one))
+    numerator = domain.to_sympy(rows[last_row].get(rhs_column, domain.zero))
+    return numerator / scale, domain.to_sympy(determinant) / scale
+
+def solve_numeric(G, source, sink):
+    """
+    (transfer function, det(I - A)) as floats for a graph whose gains are
+    all numbers, with a sparse LU solve when SciPy is available.
+    """
+    index = graph_index(G)
+    count = len(index.nodes)
+    entries = node_matrix_entries(G)
+    rows, cols = zip(*entries)
+    data = np.array([complex(value) for value in entries.values()])
+    if not data.imag.any():
+        data = data.real
+    rhs = np.zeros(count)
+    rhs[index.node_index[source]] = 1.0
+    try:
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import splu
+    except ImportError:
+        matrix = np.zeros((count, count), dtype=data.dtype)
+        matrix[rows, cols] = data
+        try:
+            x = np.linalg.solve(matrix, rhs)
+        except np.linalg.LinAlgError as e:
+            raise ValueError("The node equations are singular (Δ = 0)") from e
+        determinant = np.linalg.det(matrix)
+    else:
+        try:
+            lu = splu(csc_matrix((data, (rows, cols)), shape=(count, count)))
+        except RuntimeError as e:  # "Factor is exactly singular"
+            raise ValueError("The node equations are singular (Δ = 0)") from e
+        x = lu.solve(rhs)
+        # det = det(P_r) det(L) det(U) det(P_c) with L unit-diagonal
+        determinant = (np.prod(lu.U.diagonal()) * _permutation_sign(lu.perm_r)
+                       * _permutation_sign(lu.perm_c))
+    return x[index.node_index[sink]], determinant
+
+def _permutation_sign(permutation):
+    """+1 or -1: the parity of a permutation given as an index array"""
+    sign = 1
+    seen = [False] * len(permutation)
+    for start in range(len(permutation)):
+        length = 0
+        node = start
+        while not seen[node]:
+            seen[node] = True
+            node = permutation[node]
+            length += 1
+        if length and length % 2 == 0:
+            sign = -sign
+    return sign
+
+def analyze_by_elimination(G, source, sink, fast=False):
+    """
+    The /analyze result computed from the node equations, as (result,
+    TransferFunctionParts). There are no forward paths or loops to report,
+    so those sections are empty and "engine" says how it was computed.
+    """
+    index = graph_index(G)
+    numeric = not any(weight.free_symbols for _, _, weight in index.edges.values())
+    # A source or sink that is not in G gives T = 0, as in Mason's formula
+    # with no forward paths; det(I - A) is still solved for from any node
+    unconnected = source not in index.node_index or sink not in index.node_index
+    start, end = (index.nodes[0], index.nodes[0]) if unconnected and index.nodes else (source, sink)
+    with timed_stage("elimination"):
+        if not index.nodes:
+            numerator, determinant = sp.Integer(0), sp.Integer(1)
+            transfer_function = numerator
+        elif numeric:
+            transfer_function, determinant = solve_numeric(G, start, end)
+            transfer_function, determinant = sp.sympify(transfer_function), sp.sympify(determinant)
+            numerator = transfer_function * determinant
+        else:
+            numerator, determinant = eliminate(G, start, end)
+            transfer_function = numerator / determinant if fast else sp.cancel(numerator / determinant)
+        if unconnected:
+            numerator = transfer_function = sp.Integer(0)
+    record_count("nodes", len(graph_index(G).nodes))
+    logger.info("Solved %d node equations by %s elimination", len(graph_index(G).nodes),
+                "numeric" if numeric else "symbolic")
+
+    analysis_result = {
+        "engine": "elimination",
+        "forward_paths": [],
+        "forward_path_gains": [],
+        "loops": [],
+        "loop_gains": [],
+        "determinant": {
+            "expression": "det(I - A)",
+            "numeric_value": str(determinant)
+        },
+        "path_determinants": [],
+        "transfer_function": {
+            "expression": f"x_{sink}/u_{source}",
+            "numeric_value": str(transfer_function)
+        }
+    }
+    if fast:
+        analysis_result["transfer_function"]["numerator"] = str(numerator)
+        analysis_result["transfer_function"]["denominator"] = str(determinant)
+    return analysis_result, TransferFunctionParts(numerator, determinant, edge_denominator=edge_denominator(G))
@@ -0,0 +1,117 @@
+"""
+Frequency response and pole-zero data of a transfer function.
+
+The numerator and denominator are turned once into NumPy polynomial
+coefficient arrays in the Laplace variable. The response over a whole
+frequency grid is then one vectorized np.polyval at s = jω, and the poles
+and zeros are np.roots of the arrays. Results are columnar: one array per
+quantity (Bode magnitude and phase, Nyquist real and imaginary parts)
+rather than one object per point, either as JSON lists or, with
+encoding="base64", as base64 little-endian float64 bytes.
+"""
+import base64
+from lazy_modules import LazyModule
+
+sp = LazyModule("sympy")
+np = LazyModule("numpy")
+
+MAX_POINTS = 100000
+
+def frequency_grid(spec):
+    """
+    Angular frequencies (rad/s) described by spec: an explicit "omega" list,
+    or "start", "stop", "points" and "scale" ("log", the default, or
+    "linear"). Raises ValueError for a grid that cannot be built.
+    """
+    if spec.get("omega") is not None:
+        omega = np.asarray(spec["omega"], dtype=float)
+    else:
+        start, stop = float(spec.get("start", 0.01)), float(spec.get("stop", 100))
+        points = int(spec.get("points", 1000))
+        if points < 2:
+            raise ValueError("A frequency grid needs at least 2 points")
+        scale = spec.get("scale", "log")
+        if scale == "log":
+            if start <= 0 or stop <= 0:
+                raise ValueError("A log frequency grid needs start and stop > 0")
+            omega = np.logspace(np.log10(start), np.log10(stop), points)
+        elif scale == "linear":
+            omega = np.linspace(start, stop, points)
+        else:
+            raise ValueError(f"Unknown frequency scale {scale!r} (expected 'log' or 'linear')")
+    if omega.ndim != 1 or len(omega) > MAX_POINTS:
+        raise ValueError(f"A frequency grid is a list of at most {MAX_POINTS} points")
+    return omega
+
+def coefficient_array(coefficients):
+    """NumPy array of numeric coefficients, highest power first (complex only if needed)"""
+    array = np.array([complex(c) for c in coefficients])
+    return array if array.imag.any() else array.real
+
+def frequency_response(numerator, denominator, omega):
+    """
+    N(jω) / D(jω) for coefficient arrays over the grid omega, with its
+    magnitude in dB and its phase in degrees (unwrapped, so it is continuous
+    across ±180°). Points where D(jω) = 0 give inf/nan.
+    """
+    s = 1j * omega
+    with np.errstate(divide="ignore", invalid="ignore"):
+        response = np.polyval(numerator, s) / np.polyval(denominator, s)
+        magnitude = 20 * np.log10(np.abs(response))
+    phase = np.degrees(np.unwrap(np.angle(response)))
+    return response, magnitude, phase
+
+def pole_zero(numerator, denominator):
+    """(zeros, poles, gain) of N(s) / D(s), gain being the ratio of the leading coefficients"""
+    numerator, denominator = np.trim_zeros(numerator, "f"), np.trim_zeros(denominator, "f")
+    if not len(numerator):
+        return np.roots(numerator), np.roots(denominator), 0  # T = 0 has no zeros to speak of
+    return np.roots(numerator), np.roots(denominator), numerator[0] / denominator[0]
+
+def encode_array(array, encoding="list"):
+    """
+    A real array in the response encoding: a JSON list (inf/nan become
+    None, which JSON can carry) or {"dtype", "length", "data"} with the
+    base64 of its little-endian float64 bytes.
+    """
+    array = np.asarray(array, dtype=float)
+    if encoding == "base64":
+        return {
+            "dtype": "<f8",
+            "length": len(array),
+            "data": base64.b64encode(array.astype("<f8").tobytes()).decode("ascii")
+        }
+    if np.isfinite(array).all():
+        return array.tolist()
+    return [value if np.isfinite(value) else None for value in array.tolist()]
+
+def frequency_analysis(numerator, denominator, spec, variable="s"):
+    """
+    Frequency response over the grid in spec (see frequency_grid) and the
+    poles and zeros of N/D, given their numeric coefficients (highest power
+    first). spec may set "encoding" to "base64" for compact arrays.
+    """
+    numerator, denominator = coefficient_array(numerator), coefficient_array(denominator)
+    encoding = spec.get("encoding", "list")
+    if encoding not in ("list", "base64"):
+        raise ValueError(f"Unknown encoding {encoding!r} (expected 'list' or 'base64')")
+    omega = frequency_grid(spec)
+    response, magnitude, phase = frequency_response(numerator, denominator, omega)
+    zeros, poles, gain = pole_zero(numerator, denominator)
+    gain = complex(gain)
+
+    return {
+        "variable": variable,
+        "points": len(omega),
+        "encoding": encoding,
+        "columns": {
+            "omega": encode_array(omega, encoding),
+            "magnitude_db": encode_array(magnitude, encoding),
+            "phase_deg": encode_array(phase, encoding),
+            "real": encode_array(response.real, encoding),
+            "imag": encode_array(response.imag, encoding),
+        },
+        "zeros": {"real": encode_array(zeros.real, encoding), "imag": encode_array(zeros.imag, encoding)},
+        "poles": {"real": encode_array(poles.real, encoding), "imag": encode_array(poles.imag, encoding)},
+        "gain": gain.real if gain.imag == 0 else {"real": gain.real, "imag": gain.imag}
+    }
@@ -0,0 +1,31 @@
+"""
+Pre-forked production serving of the analysis API:
+
+    gunicorn -c gunicorn.conf.py SignalFlowGraphCalc:app
+
+Each HTTP worker serves requests on several threads and runs /analyze
+computations in its own pool of analysis processes (see SignalFlowGraphCalc),
+so a slow graph never blocks the threads serving other users.
+"""
+import os
+
+# Read by SignalFlowGraphCalc when the workers import it
+os.environ.setdefault("SFG_ANALYSIS_WORKERS", "2")
+os.environ.setdefault("SFG_ANALYSIS_BUDGET", "30")
+os.environ.setdefault("SFG_MAX_CONCURRENT_ANALYSES", "4")
+os.environ.setdefault("SFG_STORE_PATH", "analysis_store.sqlite3")
+
+bind = os.environ.get("SFG_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("SFG_HTTP_WORKERS", 2))
+worker_class = "gthread"
+threads = 8
+
+# Longer than the analysis budget, so gunicorn only restarts a worker that is really stuck
+timeout = int(float(os.environ["SFG_ANALYSIS_BUDGET"])) + 30
+graceful_timeout = 10
+
+def post_worker_init(worker):
+    # Start each HTTP worker's analysis processes before it takes requests
+    from SignalFlowGraphCalc import ANALYSIS_POOL, ANALYSIS_WORKERS
+    if ANALYSIS_WORKERS:
+        ANALYSIS_POOL.get(ANALYSIS_WORKERS)
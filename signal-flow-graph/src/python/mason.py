@@ -0,0 +1,1643 @@
+"""
+Mason's gain formula engine for signal flow graphs.
+
+Nothing here depends on Flask: SignalFlowGraphCalc.py serves it over HTTP
+and cli.py runs it from the command line. sympy and networkx are only
+imported when first used, so importing this module stays cheap.
+"""
+import contextvars
+import logging
+import signal
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from itertools import islice, product
+from frequency import frequency_analysis
+from lazy_modules import LazyModule
+from routh import routh_sweep, routh_table
+
+sp = LazyModule("sympy")
+nx = LazyModule("networkx")
+np = LazyModule("numpy")  # Only imported here by load_analysis_modules; lambdify uses it
+
+logger = logging.getLogger(__name__)
+
+# Values of the "engine" option, see iter_analysis
+ENGINES = ("auto", "mason", "elimination")
+
+# StageTimings of the analysis running in the current thread/context, if any
+_active_timings = contextvars.ContextVar("active_timings", default=None)
+
+class StageTimings:
+    """
+    Wall-clock time per analysis stage and item counts for one request.
+    Stages may nest: time spent in sp.simplify is reported as "simplify" and
+    is also part of the "determinant" and "transfer_function" stages.
+    """
+
+    def __init__(self):
+        self.stages = {}  # stage name -> seconds
+        self.counts = {}  # item kind -> count
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def activate(self):
+        """Make timed_stage/record_count calls in this context report here"""
+        token = _active_timings.set(self)
+        try:
+            yield self
+        finally:
+            _active_timings.reset(token)
+
+    def merge(self, other):
+        """Add the stages and counts recorded in another StageTimings, e.g. a worker's"""
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        self.counts.update(other.counts)
+
+    def as_dict(self):
+        return {
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "counts": dict(self.counts)
+        }
+
+@contextmanager
+def timed_stage(stage):
+    """Time the enclosed block as the given stage of the active StageTimings"""
+    timings = _active_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+def record_count(kind, value):
+    """Record an item count (paths, loops, ...) on the active StageTimings"""
+    timings = _active_timings.get()
+    if timings is not None:
+        timings.counts[kind] = value
+
+class GraphIndex:
+    """
+    Compact view of a built graph used by the Mason's formula functions:
+    an edge-id -> (u, v, weight) index plus integer-indexed adjacency arrays,
+    so every gain lookup is O(1) instead of a scan over G.edges.
+
+    Gain products of edge sequences (paths and loops) are hash-consed in a
+    trie keyed by (prefix node, next edge id): each distinct prefix product
+    is built once, from its parent, and every path or loop that shares it
+    reuses the same sympy expression.
+    """
+
+    def __init__(self, G):
+        self.nodes = list(G.nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edges = {}        # edge id -> (u, v, weight)
+        self.edge_keys = {}    # edge id -> MultiDiGraph key
+        self.edge_order = {}   # edge id -> position in G.edges iteration order
+        self.out_edges = [[] for _ in self.nodes]  # node index -> [(target index, edge id)]
+        self.out_position = {} # edge id -> position in its source's out_edges
+        self.pair_edges = {}   # (u index, v index) -> parallel edge ids, in key order
+        for u, v, key, data in G.edges(keys=True, data=True):
+            edge_id = data['id']
+            ui, vi = self.node_index[u], self.node_index[v]
+            self.edges[edge_id] = (u, v, data['weight'])
+            self.edge_keys[edge_id] = key
+            self.edge_order[edge_id] = len(self.edge_order)
+            self.out_position[edge_id] = len(self.out_edges[ui])
+            self.out_edges[ui].append((vi, edge_id))
+            self.pair_edges.setdefault((ui, vi), []).append(edge_id)
+        self._components = None
+        self._product_trie = {}     # (prefix node, edge id) -> node
+        self._product_values = [1]  # node -> gain product; node 0 is the empty product
+
+    def weight(self, edge_id):
+        """Gain of the edge with the given id, or None if there is no such edge"""
+        entry = self.edges.get(edge_id)
+        return entry[2] if entry is not None else None
+
+    def first_edge(self, u, v):
+        """Id of the first edge from u to v (the one a plain u->v lookup uses)"""
+        edge_ids = self.pair_edges.get((self.node_index[u], self.node_index[v]))
+        return edge_ids[0] if edge_ids else None
+
+    def set_weight(self, edge_id, weight):
+        """Change an edge's gain, dropping the products built from the old one"""
+        u, v, _ = self.edges[edge_id]
+        self.edges[edge_id] = (u, v, weight)
+        self._product_trie = {}
+        self._product_values = [1]
+
+    def product(self, edge_ids):
+        """Product of the gains of the given edges, in order, shared with every sequence it prefixes"""
+        node = 0
+        for edge_id in edge_ids:
+            child = self._product_trie.get((node, edge_id))
+            if child is None:
+                child = self._product_trie[(node, edge_id)] = len(self._product_values)
+                self._product_values.append(self._product_values[node] * self.edges[edge_id][2])
+            node = child
+        return self._product_values[node]
+
+    def components(self):
+        """Strongly connected component number of every node index, computed once"""
+        if self._components is None:
+            successors = [{target for target, _ in out} for out in self.out_edges]
+            self._components = [0] * len(self.nodes)
+            for number, component in enumerate(
+                    _strongly_connected_components(successors, set(range(len(self.nodes))))):
+                for node in component:
+                    self._components[node] = number
+        return self._components
+
+    def dead_ends(self, end):
+        """Node indices that cannot reach end, so no path to end passes through them"""
+        predecessors = [[] for _ in self.nodes]
+        for u, out in enumerate(self.out_edges):
+            for v, _ in out:
+                predecessors[v].append(u)
+        alive = {end}
+        pending = [end]
+        while pending:
+            for u in predecessors[pending.pop()]:
+                if u not in alive:
+                    alive.add(u)
+                    pending.append(u)
+        return set(range(len(self.nodes))) - alive
+
+def graph_index(G):
+    """Return the GraphIndex of G, building it if G was not made by build_graph"""
+    index = G.graph.get('index')
+    if index is None:
+        index = G.graph['index'] = GraphIndex(G)
+    return index
+
+def build_graph(nodes, edges):
+    """
+    Build the MultiDiGraph for the request. Its compact GraphIndex is attached
+    as G.graph['index'] and is what the analysis functions work from.
+    """
+    G = nx.MultiDiGraph()  # Use MultiDiGraph to allow parallel edges
+    for node in nodes:
+        G.add_node(node['id'])
+    for i, edge in enumerate(edges):
+        weight = sp.sympify(edge['label'])
+        G.add_edge(edge['source'], edge['target'], weight=weight, id=f"edge_{i}")
+    G.graph['index'] = GraphIndex(G)
+    return G
+
+def get_edge_weight_by_id(G, edge_id):
+    # O(1) lookup in the edge index; None if the edge with the given id was not found
+    return graph_index(G).weight(edge_id)
+
+def draw_graph(G):
+    """Log the graph structure at debug level"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    index = graph_index(G)
+    lines = ["Graph Structure:", "Nodes:"]
+    lines.extend(f"  {node}" for node in index.nodes)
+    lines.append("Edges:")
+    lines.extend(f"  {u} -> {v}  (weight = {weight})" for u, v, weight in index.edges.values())
+    logger.debug("\n".join(lines))
+
+def find_forward_paths(G, source, sink):
+    """All forward paths from source to sink, as {"path", "edges_used"} dicts"""
+    return list(iter_forward_paths(G, source, sink))
+
+def iter_forward_paths(G, source, sink):
+    """
+    Yield the forward paths from source to sink one at a time, depth-first
+    in out-edge order. The search keeps a single shared path and copies it
+    only when a complete path is yielded, and never enters the nodes that
+    cannot reach the sink, which no forward path passes through. A source
+    or sink that is not in G has no forward paths.
+    """
+    index = graph_index(G)
+    if source not in index.node_index or sink not in index.node_index:
+        return
+    sink_index = index.node_index[sink]
+    dead_ends = index.dead_ends(sink_index)
+    for nodes, edge_ids in _simple_edge_paths(index, index.node_index[source], sink_index, dead_ends):
+        yield {"path": [index.nodes[i] for i in nodes], "edges_used": edge_ids}
+
+def sort_forward_paths(G, paths_info):
+    """Order paths the way find_forward_paths discovers them (depth-first, by out-edge order)"""
+    out_position = graph_index(G).out_position
+    return sorted(paths_info, key=lambda info: [out_position[e] for e in info["edges_used"]])
+
+def find_paths_through_edge(G, source, sink, edge_id):
+    """Forward paths from source to sink that use the given edge"""
+    index = graph_index(G)
+    u, v, _ = index.edges[edge_id]
+    # A forward path stops at the sink and never revisits the source
+    if source == sink or u == v or u == sink or v == source:
+        return []
+    if source not in index.node_index or sink not in index.node_index:
+        return []
+    ui, vi = index.node_index[u], index.node_index[v]
+    si, ti = index.node_index[source], index.node_index[sink]
+
+    paths = []
+    for prefix_nodes, prefix_edges in _simple_edge_paths(index, si, ui, {vi, ti}):
+        for suffix_nodes, suffix_edges in _simple_edge_paths(index, vi, ti, set(prefix_nodes)):
+            paths.append({
+                "path": [index.nodes[i] for i in prefix_nodes + suffix_nodes],
+                "edges_used": prefix_edges + [edge_id] + suffix_edges
+            })
+    return paths
+
+def find_loops_through_edge(G, edge_id):
+    """Loops of G that use the given edge, as (loops, loop_edges) in canonical form"""
+    index = graph_index(G)
+    u, v, _ = index.edges[edge_id]
+    if u == v:
+        return [[u, u]], [[edge_id]]
+
+    loops = []
+    loop_edges = []
+    for nodes, edge_ids in _simple_edge_paths(index, index.node_index[v], index.node_index[u]):
+        # nodes runs v -> ... -> u, so the loop is u -> v -> ... -> u
+        loop, edge_ids = canonicalize_loop([u] + [index.nodes[i] for i in nodes[:-1]],
+                                           [edge_id] + edge_ids)
+        loops.append(loop)
+        loop_edges.append(edge_ids)
+    return loops, loop_edges
+
+def _simple_edge_paths(index, start, end, blocked=()):
+    """
+    Yield (node indices, edge ids) for every simple path from start to end
+    that avoids the blocked node indices, without recursion. A path stops as
+    soon as it reaches end.
+    """
+    path = [start]
+    edge_ids = []
+    on_path = {start}
+    work = [iter(index.out_edges[start])]
+    if start == end:
+        yield list(path), []
+        return
+    while work:
+        for target, edge_id in work[-1]:
+            if target in on_path or target in blocked:
+                continue
+            if target == end:
+                yield path + [target], edge_ids + [edge_id]
+                continue
+            path.append(target)
+            edge_ids.append(edge_id)
+            on_path.add(target)
+            work.append(iter(index.out_edges[target]))
+            break
+        else:
+            work.pop()
+            on_path.discard(path.pop())
+            if edge_ids:
+                edge_ids.pop()
+
+def find_unique_loops(G):
+    """Find every elementary loop of G once, with the product of its edge gains"""
+    loops, loop_edges = find_loop_edges(G)
+    return loops, [calculate_edge_gain(G, edge_ids) for edge_ids in loop_edges]
+
+def find_loop_edges(G):
+    """Find every elementary loop of G once, with the ids of the edges it uses"""
+    all_loops = []
+    all_edges = []
+    for cycle_nodes, edge_ids in enumerate_loops(G):
+        all_loops.append(cycle_nodes)
+        all_edges.append(edge_ids)
+    return sort_loops(G, all_loops, all_edges)
+
+class EnumerationLimits:
+    """
+    Caps on how many forward paths and loops an analysis enumerates and on
+    how long enumeration may run. deadline is in seconds from creation.
+    Which enumerations were cut short, and why, is kept in truncated.
+    """
+
+    def __init__(self, max_paths=None, max_loops=None, deadline=None):
+        self.max_paths = max_paths
+        self.max_loops = max_loops
+        self.expires = time.monotonic() + deadline if deadline is not None else None
+        self.truncated = {}  # "paths"/"loops" -> "limit" or "deadline"
+
+    @classmethod
+    def from_request(cls, data):
+        """
+        Limits set in an /analyze payload, or None if it sets none. Raises
+        ValueError for a limit that is not a non-negative number.
+        """
+        max_paths = _non_negative(data, 'max_paths', int)
+        max_loops = _non_negative(data, 'max_loops', int)
+        deadline = _non_negative(data, 'deadline', float)
+        if max_paths is None and max_loops is None and deadline is None:
+            return None
+        return cls(max_paths, max_loops, deadline)
+
+    def take(self, kind, items):
+        """Yield from items until the limit for kind or the deadline is reached"""
+        limit = self.max_paths if kind == "paths" else self.max_loops
+        for count, item in enumerate(items):
+            if limit is not None and count >= limit:
+                self.truncated[kind] = "limit"
+                return
+            if self.expires is not None and time.monotonic() > self.expires:
+                self.truncated[kind] = "deadline"
+                return
+            yield item
+
+def _non_negative(data, key, kind):
+    """data[key] converted with kind (int or float), None if unset; ValueError if negative or not a number"""
+    value = data.get(key)
+    if value is None:
+        return None
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        number = None
+    if number is None or not number >= 0:
+        raise ValueError(f"{key} must be a non-negative number, not {value!r}")
+    return number
+
+def sort_loops(G, loops, loop_edges):
+    """Sort loops (and their edge id lists) into the order used for L1, L2, ..."""
+    # Create pairs of loops and edges for sorting
+    loop_edge_pairs = list(zip(loops, loop_edges))
+
+    # Sort by the smallest node in the loop, then by length; the remaining keys
+    # only make the order (and so the L1, L2, ... numbering) deterministic
+    edge_order = graph_index(G).edge_order
+    sorted_pairs = sorted(
+        loop_edge_pairs,
+        key=lambda x: (min(x[0]), len(x[0]), x[0], [edge_order[e] for e in x[1]])
+    )
+
+    sorted_loops, sorted_edges = zip(*sorted_pairs) if loop_edge_pairs else ([], [])
+    return list(sorted_loops), list(sorted_edges)
+
+def calculate_edge_gain(G, edge_ids):
+    """Product of the gains of the given edges, shared through the GraphIndex product trie"""
+    return graph_index(G).product(edge_ids)
+
+def enumerate_loops(G):
+    """
+    Yield every elementary loop of G exactly once as (nodes, edge_ids).
+
+    Node-level cycles come from Johnson's algorithm; each one is then expanded
+    over the parallel edges between consecutive nodes. Self-loops are emitted
+    directly, one per self-loop edge. Nodes are returned in canonical order
+    (starting and ending with the smallest node).
+    """
+    index = graph_index(G)
+
+    # Self-loops are handled separately from the node-level cycle search
+    successors = [set() for _ in index.nodes]
+    for (ui, vi), edge_ids in index.pair_edges.items():
+        if ui == vi:
+            node = index.nodes[ui]
+            for edge_id in edge_ids:
+                yield [node, node], [edge_id]
+        else:
+            successors[ui].add(vi)
+
+    for cycle in _simple_cycles(successors):
+        edge_choices = [
+            index.pair_edges[(cycle[i], cycle[(i + 1) % len(cycle)])] for i in range(len(cycle))
+        ]
+        nodes = [index.nodes[i] for i in cycle]
+        for edge_ids in product(*edge_choices):
+            yield canonicalize_loop(nodes, list(edge_ids))
+
+def _strongly_connected_components(successors, nodes):
+    """Iterative Tarjan's algorithm over integer adjacency, restricted to nodes"""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, neighbours = work[-1]
+            advanced = False
+            for nxt in neighbours:
+                if nxt not in nodes:
+                    continue
+                if nxt not in index:
+                    index[nxt] = lowlink[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(successors[nxt])))
+                    advanced = True
+                    break
+                if nxt in on_stack:
+                    lowlink[node] = min(lowlink[node], index[nxt])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+def _simple_cycles(successors):
+    """
+    Johnson's algorithm: yield each elementary cycle (as a list of node
+    indices) of a simple digraph without self-loops, without recursion.
+    """
+    pending = [c for c in _strongly_connected_components(successors, set(range(len(successors))))
+               if len(c) > 1]
+    while pending:
+        component = pending.pop()
+        start = min(component)
+        path = [start]
+        blocked = {start}
+        closed = set()
+        blocked_by = {node: set() for node in component}
+        work = [(start, iter(successors[start] & component))]
+        while work:
+            node, neighbours = work[-1]
+            for nxt in neighbours:
+                if nxt == start:
+                    yield list(path)
+                    closed.update(path)
+                elif nxt not in blocked:
+                    path.append(nxt)
+                    work.append((nxt, iter(successors[nxt] & component)))
+                    closed.discard(nxt)
+                    blocked.add(nxt)
+                    break
+            else:
+                if node in closed:
+                    # Unblock node and everything transitively waiting on it
+                    to_unblock = [node]
+                    while to_unblock:
+                        current = to_unblock.pop()
+                        if current in blocked:
+                            blocked.remove(current)
+                            to_unblock.extend(blocked_by[current])
+                            blocked_by[current].clear()
+                else:
+                    for nxt in successors[node] & component:
+                        blocked_by[nxt].add(node)
+                work.pop()
+                path.pop()
+        # Every cycle through start has been found; search the rest without it
+        remaining = component - {start}
+        pending.extend(c for c in _strongly_connected_components(successors, remaining)
+                       if len(c) > 1)
+
+def canonicalize_cycle(cycle):
+    """
+    Convert cycle to canonical form (starting with lexicographically smallest node)
+    """
+    cycle = cycle[:-1]
+    min_node = min(cycle)
+    min_idx = cycle.index(min_node)
+    canonical = cycle[min_idx:] + cycle[:min_idx] + [min_node]
+    return canonical
+
+def canonicalize_loop(nodes, edge_ids):
+    """
+    Rotate an open cycle (nodes[i] -> nodes[i + 1] over edge_ids[i]) to its
+    canonical form; returns the closed node list and the matching edge ids.
+    """
+    canonical = canonicalize_cycle(nodes + [nodes[0]])
+    shift = nodes.index(canonical[0])
+    return canonical, edge_ids[shift:] + edge_ids[:shift]
+
+def calculate_path_gain(G, path, edges_used=None):
+    """
+    Calculate the gain of a path, optionally using specific edges identified by their IDs.
+    """
+    index = graph_index(G)
+    edge_ids = []
+
+    for i in range(len(path) - 1):
+        edge_id = None
+        if edges_used and isinstance(edges_used, list):
+            # Use the specific edge we were given if it really joins these nodes
+            u, v, _ = index.edges.get(edges_used[i], (None, None, None))
+            if (u, v) == (path[i], path[i + 1]):
+                edge_id = edges_used[i]
+        if edge_id is None:
+            # Use the first edge when multiple exist (or as a fallback)
+            edge_id = index.first_edge(path[i], path[i + 1])
+        if edge_id is not None:
+            edge_ids.append(edge_id)
+
+    return index.product(edge_ids)
+
+def are_touching(loop1, loop2):
+    """Check if two loops share any nodes"""
+    # Remove the duplicate end node for comparison
+    set1 = set(loop1[:-1])
+    set2 = set(loop2[:-1])
+    return bool(set1.intersection(set2))
+
+def loop_node_mask(G, loop):
+    """Bitmask of the nodes a loop (or path) passes through, one bit per node index"""
+    node_index = graph_index(G).node_index
+    mask = 0
+    for node in loop:
+        mask |= 1 << node_index[node]
+    return mask
+
+def find_non_touching_groups(loop_masks, max_order=None):
+    """
+    Enumerate every group of two or more mutually non-touching loops.
+
+    loop_masks holds each loop's node bitmask. Groups are grown by ordered
+    clique extension: a group only ever takes loops with a higher index than
+    its last member, chosen from the bitmask of loops that touch none of its
+    members, so each group is generated exactly once. Returns
+    {order: [sorted index tuples]} with every order's groups in lexicographic
+    order. If max_order is given, orders above it are not enumerated.
+    """
+    count = len(loop_masks)
+    non_touching = _non_touching_masks(loop_masks)
+
+    # Each level entry is (group, loops that can still extend it)
+    level = [((i,), non_touching[i]) for i in range(count)]
+    all_non_touching_groups = {}
+    order = 2
+    while level and (max_order is None or order <= max_order):
+        next_level = []
+        for group, candidates in level:
+            while candidates:
+                low_bit = candidates & -candidates
+                idx = low_bit.bit_length() - 1
+                candidates ^= low_bit
+                next_level.append((group + (idx,), candidates & non_touching[idx]))
+        # If no groups of this order exist, we can stop
+        if not next_level and order > 2:
+            break
+        all_non_touching_groups[order] = [group for group, _ in next_level]
+        level = next_level
+        order += 1
+    return all_non_touching_groups
+
+def _non_touching_masks(loop_masks):
+    """non_touching[i] has bit j set when j > i and loops i and j share no node"""
+    count = len(loop_masks)
+    non_touching = [0] * count
+    for i in range(count):
+        for j in range(i + 1, count):
+            if not loop_masks[i] & loop_masks[j]:
+                non_touching[i] |= 1 << j
+    return non_touching
+
+def count_non_touching_groups(loop_masks, limit):
+    """
+    Number of groups find_non_touching_groups would return, without
+    building them; counting stops as soon as it passes limit.
+    """
+    non_touching = _non_touching_masks(loop_masks)
+    pending = list(non_touching)  # candidates that can extend each group
+    total = 0
+    while pending:
+        candidates = pending.pop()
+        while candidates:
+            low_bit = candidates & -candidates
+            candidates ^= low_bit
+            total += 1
+            if total > limit:
+                return total
+            pending.append(candidates & non_touching[low_bit.bit_length() - 1])
+    return total
+
+def estimate_mason_work(G, source, sink, max_paths=200, max_loops=60, max_groups=5000):
+    """
+    Count the forward paths, loops and non-touching groups Mason's formula
+    would need, stopping each count just past its limit (a count above the
+    limit means "at least"). tractable says whether all are within limits.
+    """
+    paths = sum(1 for _ in islice(iter_forward_paths(G, source, sink), max_paths + 1))
+    loops = list(islice(enumerate_loops(G), max_loops + 1))
+    groups = None
+    if len(loops) <= max_loops:
+        groups = count_non_touching_groups([loop_node_mask(G, nodes) for nodes, _ in loops], max_groups)
+    return {
+        "paths": paths,
+        "loops": len(loops),
+        "groups": groups,
+        "tractable": paths <= max_paths and groups is not None and groups <= max_groups
+    }
+
+class LoopInteractionModel:
+    """
+    Loop interaction data shared by every determinant of one analysis: loop
+    node bitmasks, the lattice of non-touching groups and each group's gain
+    product. Δ and every Δk are read from it by filtering out the loops and
+    groups that touch a path, so the groups are enumerated once per request
+    and each distinct determinant is simplified once. With simplify=False
+    determinants are left as sums of loop products, skipping sp.simplify
+    entirely.
+
+    A loop lies inside one strongly connected component of the graph, and
+    loops in different components never touch, so Δ is the product of one
+    factor per component, each built only from that component's loops and
+    groups. A path leaves the factors of the components it does not touch
+    unchanged, so Δk reuses them and only recomputes the touched ones.
+    """
+
+    def __init__(self, G, loops, loop_gains=None, max_order=None, simplify=True, groups=None):
+        self.loops = loops
+        self.simplify = simplify
+        if loop_gains is None:
+            loop_gains = [calculate_path_gain(G, loop) for loop in loops]
+        self.loop_gains = list(loop_gains)
+        self.loop_masks = [loop_node_mask(G, loop[:-1]) for loop in loops]
+        # groups can be passed in when only gains changed since they were found
+        if groups is None:
+            groups = find_non_touching_groups(self.loop_masks, max_order)
+        self.groups = groups
+
+        # Node mask and gain product of every group, extended from its parent
+        # group (the group without its last loop) found at the previous order
+        self.group_masks = {(i,): mask for i, mask in enumerate(self.loop_masks)}
+        self.group_products = {(i,): gain for i, gain in enumerate(self.loop_gains)}
+
+        # Loops and groups of each component, by the component of their first
+        # node; a group spanning components (None) only appears in Δ expanded
+        component_of = graph_index(G).components()
+        node_index = graph_index(G).node_index
+        group_components = {(i,): component_of[node_index[loop[0]]] for i, loop in enumerate(loops)}
+        self.component_loops = {}   # component -> loop indices
+        self.component_masks = {}   # component -> node mask of its loops
+        for i, mask in enumerate(self.loop_masks):
+            component = group_components[(i,)]
+            self.component_loops.setdefault(component, []).append(i)
+            self.component_masks[component] = self.component_masks.get(component, 0) | mask
+        self.component_groups = {component: {} for component in self.component_loops}
+
+        for order in sorted(self.groups):
+            for group in self.groups[order]:
+                parent, last = group[:-1], group[-1]
+                self.group_masks[group] = self.group_masks[parent] | self.loop_masks[last]
+                self.group_products[group] = self.group_products[parent] * self.loop_gains[last]
+                component = group_components[parent]
+                if component is not None and component != group_components[(last,)]:
+                    component = None
+                group_components[group] = component
+                if component is not None:
+                    self.component_groups[component].setdefault(order, []).append(group)
+
+        self._numeric_cache = {}    # path node mask -> determinant
+        self._component_cache = {}  # (component, touched node mask) -> simplified factor
+
+    def determinant(self, loop_mapping=None, path_mask=0):
+        """
+        Δ when path_mask is 0, otherwise Δk for the path with that node mask.
+        Returns 1 when no loop is left, the simplified value without a
+        loop_mapping, and {"expression", "numeric_value"} with one.
+        """
+        indices = [i for i, mask in enumerate(self.loop_masks) if not mask & path_mask]
+        # If no loops, determinant is 1
+        if not indices:
+            return 1
+        groups = {
+            order: [group for group in order_groups if not self.group_masks[group] & path_mask]
+            for order, order_groups in self.groups.items()
+        }
+
+        numeric_delta = self._numeric_cache.get(path_mask)
+        if numeric_delta is None:
+            numeric_delta = 1
+            for component, component_mask in self.component_masks.items():
+                numeric_delta *= self._component_factor(component, path_mask & component_mask)
+            self._numeric_cache[path_mask] = numeric_delta
+
+        if not loop_mapping:
+            return numeric_delta
+
+        # Create symbolic representation
+        terms = ["1"]  # Start with 1
+
+        # First-order terms: -L1, -L2, etc.
+        for i in indices:
+            terms.append(f"-{loop_mapping[i]}")
+
+        # Add higher-order terms with appropriate signs
+        for order, order_groups in groups.items():
+            sign = "+" if order % 2 == 0 else "-"  # + for even, - for odd orders
+            for group in order_groups:
+                terms.append(sign + "*".join(loop_mapping[idx] for idx in group))
+
+        return {
+            "expression": " ".join(terms),
+            "numeric_value": numeric_delta
+        }
+
+    def _component_factor(self, component, touched_mask):
+        """
+        The factor of Δk contributed by one component, given the nodes of it
+        the path touches (0 for Δ and for every path that misses it)
+        """
+        key = (component, touched_mask)
+        factor = self._component_cache.get(key)
+        if factor is None:
+            indices = [i for i in self.component_loops[component] if not self.loop_masks[i] & touched_mask]
+            # Built as one sum over the shared group products; adding them
+            # one at a time would rebuild the growing sum for every term
+            terms = [1] + [-self.loop_gains[i] for i in indices]
+            for order, order_groups in self.component_groups[component].items():
+                sign = 1 if order % 2 == 0 else -1  # +1 for even, -1 for odd orders
+                terms.extend(sign * self.group_products[group] for group in order_groups
+                             if not self.group_masks[group] & touched_mask)
+            factor = sp.Add(*terms) if indices else 1
+            if self.simplify and indices:
+                with timed_stage("simplify"):
+                    factor = sp.simplify(factor)
+            self._component_cache[key] = factor
+        return factor
+
+def calculate_determinant(G, loops, loop_mapping=None, max_order=None, model=None):
+    """
+    Calculate the determinant Δ using Mason's formula. Pass the request's
+    LoopInteractionModel as model to reuse its groups; max_order optionally
+    caps the highest order of non-touching groups included (the result is
+    then truncated).
+    """
+    # If no loops, determinant is 1
+    if not loops:
+        return 1
+    if model is None:
+        model = LoopInteractionModel(G, loops, max_order=max_order)
+    return model.determinant(loop_mapping)
+
+def calculate_path_determinant(G, path, loops, loop_mapping=None, model=None):
+    """Calculate determinant Δₖ for a specific forward path from the loops it does not touch"""
+    if not loops:
+        return 1
+    if model is None:
+        model = LoopInteractionModel(G, loops)
+    return model.determinant(loop_mapping, loop_node_mask(G, path))
+
+def create_transfer_function_expression(G, forward_paths_info, loops, path_mapping, loop_mapping, model=None):
+    """Create a symbolic transfer function expression using P1, P2, etc. and L1, L2, etc."""
+    if model is None:
+        model = LoopInteractionModel(G, loops)
+
+    # Calculate path gains
+    path_gains = []
+    for i, path_info in enumerate(forward_paths_info):
+        path = path_info["path"]
+        edges_used = path_info.get("edges_used")
+        gain = calculate_path_gain(G, path, edges_used)
+        path_gains.append(gain)
+    
+    # Calculate the main determinant expression
+    main_delta = calculate_determinant(G, loops, loop_mapping, model=model)
+    
+    # Calculate path determinants for each forward path
+    path_determinants = []
+    for path_info in forward_paths_info:
+        path = path_info["path"]
+        path_determinants.append(calculate_path_determinant(G, path, loops, loop_mapping, model=model))
+    
+    # Create the transfer function expression
+    numerator_terms = []
+    for i, (path_gain, path_det) in enumerate(zip(path_gains, path_determinants)):
+        path_symbol = path_mapping[i]
+        if isinstance(path_det, dict):  # If we have a symbolic expression
+            if path_det["expression"] == "1":  # If determinant is 1
+                numerator_terms.append(f"{path_symbol}")
+            else:
+                numerator_terms.append(f"{path_symbol}*({path_det['expression']})")
+        else:
+            if path_det == 1:  # If determinant is 1
+                numerator_terms.append(f"{path_symbol}")
+            else:
+                numerator_terms.append(f"{path_symbol}*{path_det}")
+    
+    numerator_expr = " + ".join(numerator_terms)
+    
+    if isinstance(main_delta, dict):  # If we have a symbolic expression
+        if main_delta["expression"] == "1":  # If main determinant is 1
+            transfer_function_expr = numerator_expr
+        else:
+            transfer_function_expr = f"({numerator_expr})/({main_delta['expression']})"
+    else:
+        if main_delta == 1:  # If main determinant is 1
+            transfer_function_expr = numerator_expr
+        else:
+            transfer_function_expr = f"({numerator_expr})/({main_delta})"
+    
+    # Also calculate the numeric value, reusing the determinants found above
+    numeric_tf = sp.Add(*(
+        path_gain * (path_det["numeric_value"] if isinstance(path_det, dict) else path_det)
+        for path_gain, path_det in zip(path_gains, path_determinants)
+    ))
+    
+    numeric_delta = main_delta
+    if isinstance(numeric_delta, dict):
+        numeric_delta = numeric_delta["numeric_value"]
+    
+    numerator = numeric_tf
+    if numeric_delta != 1:
+        numeric_tf = numeric_tf / numeric_delta
+    
+    if model.simplify:
+        with timed_stage("simplify"):
+            numeric_tf = sp.simplify(numeric_tf)
+
+    return {
+        "expression": transfer_function_expr,
+        "numeric_value": numeric_tf,
+        "numerator": numerator,
+        "denominator": numeric_delta
+    }
+
+def calculate_transfer_function(G, forward_paths_info, loops, path_mapping=None, loop_mapping=None, model=None):
+    """Calculate transfer function using Mason's Gain Formula"""
+    if model is None:
+        model = LoopInteractionModel(G, loops)
+    if path_mapping and loop_mapping:
+        return create_transfer_function_expression(G, forward_paths_info, loops, path_mapping, loop_mapping, model)
+    
+    # Calculate the main determinant (Δ)
+    delta = calculate_determinant(G, loops, model=model)
+    
+    # Calculate the numerator terms (Pₖ × Δₖ)
+    terms = []
+    for path_info in forward_paths_info:
+        path = path_info["path"]
+        edges_used = path_info.get("edges_used")
+        path_gain = calculate_path_gain(G, path, edges_used)
+        path_determinant = calculate_path_determinant(G, path, loops, model=model)
+        terms.append(path_gain * path_determinant)
+    numerator = sp.Add(*terms)
+    
+    # Transfer function is T = (∑ Pₖ × Δₖ) / Δ
+    transfer_function = numerator if delta == 1 else numerator / delta
+    if model.simplify:
+        with timed_stage("simplify"):
+            transfer_function = sp.simplify(transfer_function)
+    return transfer_function
+
+def make_numeric_evaluator(numerator, denominator=1):
+    """
+    Compile T = numerator / denominator with sp.lambdify. Returns the names of
+    the free symbols (sorted) and a function taking their values in that order;
+    it returns None where the denominator vanishes.
+    """
+    numerator = sp.together(sp.sympify(numerator))
+    denominator = sp.together(sp.sympify(denominator))
+    symbols = sorted(numerator.free_symbols | denominator.free_symbols, key=lambda sym: sym.name)
+    compiled = sp.lambdify(symbols, [numerator, denominator])
+
+    def evaluate(*values):
+        num, den = compiled(*values)
+        if den == 0:
+            return None
+        return num / den
+
+    return [sym.name for sym in symbols], evaluate
+
+def evaluate_transfer_function(numerator, denominator, values, evaluator=None):
+    """
+    Evaluate T for concrete gain values. values maps symbol names to numbers,
+    or to equal-length lists of numbers to evaluate a sweep in one call.
+    Returns {"value": ...} or {"missing_symbols": [...]} if values is incomplete.
+    evaluator is a make_numeric_evaluator result to reuse, if one exists.
+    Raises ValueError for values of any other form (see check_values).
+    """
+    check_values(values)
+    symbol_names, evaluate = evaluator or make_numeric_evaluator(numerator, denominator)
+    missing = [name for name in symbol_names if name not in values]
+    if missing:
+        return {"missing_symbols": missing}
+
+    args = [values[name] for name in symbol_names]
+    if any(isinstance(arg, list) for arg in args):
+        length = max(len(arg) for arg in args if isinstance(arg, list))
+        points = zip(*[arg if isinstance(arg, list) else [arg] * length for arg in args])
+        return {"value": [_json_number(evaluate(*point)) for point in points]}
+    return {"value": _json_number(evaluate(*args))}
+
+def check_values(values):
+    """Raise ValueError unless values maps names to numbers or to equal-length lists of numbers"""
+    if not isinstance(values, dict):
+        raise ValueError("values maps gain symbols to numbers or lists of numbers")
+    lengths = set()
+    for name, value in values.items():
+        if isinstance(value, list):
+            lengths.add(len(value))
+        items = value if isinstance(value, list) else [value]
+        if not items or not all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in items):
+            raise ValueError(f"values[{name!r}] must be a number or a non-empty list of numbers, not {value!r}")
+    if len(lengths) > 1:
+        raise ValueError(f"The lists in values must all have the same length, not {sorted(lengths)}")
+
+def _json_number(value):
+    """Convert an evaluated value to something jsonify accepts"""
+    if value is None:
+        return None
+    value = complex(value)
+    if value.imag == 0:
+        return value.real
+    return {"real": value.real, "imag": value.imag}
+
+
+class TransferFunctionParts:
+    """
+    Unsimplified numerator and denominator of a graph's transfer function,
+    with the work derived from them memoized: the lambdify-compiled
+    evaluator and the polynomial coefficients in the Laplace variable. Kept next to
+    a cached analysis so queries with other gain values only substitute.
+    groups are the non-touching loop groups the determinant was built from,
+    and edge_denominator is the product of the denominators of the edge
+    gains (see edge_denominator).
+    """
+
+    def __init__(self, numerator, denominator, groups=None, edge_denominator=1):
+        self.numerator = numerator
+        self.denominator = denominator
+        self.groups = groups
+        self.edge_denominator = edge_denominator
+        self._evaluator = None
+        self._characteristic = {}  # variable -> coefficient expressions
+        self._rational = {}  # variable -> (numerator, denominator) coefficient expressions
+
+    def __repr__(self):
+        return f"TransferFunctionParts(({self.numerator})/({self.denominator}))"
+
+    def to_record(self):
+        """JSON-serializable form, including the coefficients computed so far"""
+        return {
+            "numerator": str(self.numerator),
+            "denominator": str(self.denominator),
+            "groups": {str(order): [list(group) for group in groups]
+                       for order, groups in (self.groups or {}).items()},
+            "edge_denominator": str(self.edge_denominator),
+            # Named apart from the "characteristic" and "delta_characteristic"
+            # of older records, which left out poles and must not be reused
+            "system_characteristic": {variable: [str(c) for c in coefficients]
+                                     for variable, coefficients in self._characteristic.items()},
+            "rational": {variable: [[str(c) for c in coefficients] for coefficients in pair]
+                         for variable, pair in self._rational.items()}
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild TransferFunctionParts from to_record() output"""
+        parts = cls(sp.sympify(record["numerator"]), sp.sympify(record["denominator"]),
+                    {int(order): [tuple(group) for group in groups]
+                     for order, groups in record["groups"].items()},
+                    sp.sympify(record.get("edge_denominator", "1")))
+        for variable, coefficients in record.get("system_characteristic", {}).items():
+            parts._characteristic[variable] = [sp.sympify(c) for c in coefficients]
+        for variable, pair in record.get("rational", {}).items():
+            parts._rational[variable] = tuple([sp.sympify(c) for c in coefficients] for coefficients in pair)
+        return parts
+
+    def evaluate(self, values):
+        """evaluate_transfer_function with the compiled evaluator reused"""
+        if self._evaluator is None:
+            self._evaluator = make_numeric_evaluator(self.numerator, self.denominator)
+        return evaluate_transfer_function(self.numerator, self.denominator, values, self._evaluator)
+
+    def characteristic_coefficients(self, variable="s"):
+        """
+        Coefficients (highest power first) of the characteristic polynomial in
+        variable: Δ times the denominators of the edge gains, in lowest terms
+        (det of the node matrix with every edge's denominator cleared). It is
+        not cancelled against the numerator of T, so modes that do not reach
+        the output, in loops or on open-loop edges, are kept. Other gain
+        symbols stay symbolic.
+        """
+        coefficients = self._characteristic.get(variable)
+        if coefficients is None:
+            s = sp.Symbol(variable)
+            # Factors of the edge denominators free of variable only scale the polynomial
+            _, poles = sp.sympify(self.edge_denominator).as_independent(s, as_Add=False)
+            characteristic, _ = sp.fraction(sp.cancel(sp.together(sp.sympify(self.denominator) * poles)))
+            coefficients = sp.Poly(characteristic, s).all_coeffs()
+            self._characteristic[variable] = coefficients
+        return coefficients
+
+    def rational_coefficients(self, variable="s"):
+        """
+        (numerator, denominator) coefficients of T in variable, highest power
+        first, once T is put over one fraction and common factors are
+        cancelled. Raises sp.PolynomialError if T is not rational in variable.
+        """
+        pair = self._rational.get(variable)
+        if pair is None:
+            s = sp.Symbol(variable)
+            numerator, denominator = sp.fraction(sp.cancel(sp.together(self.numerator / self.denominator)))
+            pair = sp.Poly(numerator, s).all_coeffs(), sp.Poly(denominator, s).all_coeffs()
+            self._rational[variable] = pair
+        return pair
+
+    def frequency_response(self, spec=None, values=None):
+        """
+        Bode/Nyquist columns over a frequency grid and the poles and zeros of
+        T (see frequency.frequency_analysis). spec is a dict with the grid,
+        "encoding" and "variable" (default s); scalar gain values are
+        substituted into the cached coefficients, which must then be numeric.
+        """
+        spec = spec if isinstance(spec, dict) else {}
+        variable = spec.get("variable", "s")
+        try:
+            numerator, denominator = self.rational_coefficients(variable)
+        except sp.PolynomialError as e:
+            return {"variable": variable, "error": f"Not a rational function of {variable}: {e}"}
+
+        scalars = {sp.Symbol(name): value for name, value in (values or {}).items()
+                   if name != variable and not isinstance(value, list)}
+        if scalars:
+            numerator = [coefficient.subs(scalars) for coefficient in numerator]
+            denominator = [coefficient.subs(scalars) for coefficient in denominator]
+        missing = sorted({sym.name for coefficient in numerator + denominator for sym in coefficient.free_symbols})
+        if missing:
+            return {"variable": variable, "missing_symbols": missing}
+        try:
+            return frequency_analysis(numerator, denominator, spec, variable)
+        except ValueError as e:
+            return {"variable": variable, "error": str(e)}
+
+    def stability(self, values=None, variable="s"):
+        """
+        Routh stability of the characteristic polynomial. Numeric gain values
+        are substituted into the cached coefficients; gains given as lists
+        are swept over their Cartesian grid with routh_sweep.
+        """
+        try:
+            coefficients = self.characteristic_coefficients(variable)
+        except sp.PolynomialError as e:
+            return {"variable": variable, "error": f"Not a polynomial in {variable}: {e}"}
+
+        values = values or {}
+        scalars = {sp.Symbol(name): value for name, value in values.items()
+                   if name != variable and not isinstance(value, list)}
+        sweep = {name: value for name, value in values.items()
+                 if name != variable and isinstance(value, list)}
+        if scalars:
+            coefficients = [coefficient.subs(scalars) for coefficient in coefficients]
+
+        s = sp.Symbol(variable)
+        polynomial = sum(c * s ** (len(coefficients) - 1 - i) for i, c in enumerate(coefficients))
+        return {
+            "variable": variable,
+            "characteristic_polynomial": str(polynomial),
+            "coefficients": [str(c) for c in coefficients],
+            "routh": routh_sweep(coefficients, sweep) if sweep else routh_table(coefficients)
+        }
+
+def edge_denominator(G):
+    """
+    Product of the denominators of G's edge gains. Each edge contributes
+    its own poles, even when T or Δ cancels them.
+    """
+    return sp.Mul(*(sp.fraction(sp.together(weight))[1] for _, _, weight in graph_index(G).edges.values()))
+
+def calculate_forward_path_gains(G, paths_info, path_mapping=None):
+    """Calculate gains for all forward paths with specific edges"""
+    path_gains = []
+    for i, path_info in enumerate(paths_info):
+        path = path_info["path"]
+        edges_used = path_info.get("edges_used")
+        gain = calculate_path_gain(G, path, edges_used)
+        path_id = path_mapping[i] if path_mapping else f"Path {i+1}"
+        path_gains.append({
+            "id": path_id,
+            "path": path,
+            "gain": str(gain)
+        })
+    return path_gains
+
+def format_path_for_display(path):
+    """Format a path as a string like S1->S2->S3"""
+    return "->".join(path)
+
+def run_analysis(data, timings=None):
+    """Run the full Mason's formula analysis for an /analyze request payload"""
+    return analyze_graph(
+        data.get('nodes', []), data.get('edges', []),
+        data.get('sourceNode', 'S1'), data.get('destNode', 'S4'),
+        # "fast" skips sympy.simplify and returns unsimplified numerator/denominator
+        fast=data.get('mode', 'full') == 'fast',
+        values=data.get('values'),
+        timings=timings,
+        stability=data.get('stability'),
+        frequency=data.get('frequency_response'),
+        limits=EnumerationLimits.from_request(data),
+        engine=data.get('engine', 'auto')
+    )
+
+def analyze_graph(nodes, edges, source, sink, fast=False, values=None, timings=None, stability=None,
+                  limits=None, engine="auto", frequency=None):
+    """
+    Analyze one signal flow graph with Mason's gain formula and return the
+    same result dict /analyze responds with. nodes are {"id"} dicts and edges
+    {"source", "target", "label"} dicts, as sent by the editor. Pass a
+    StageTimings to have per-stage timings and counts recorded in it; see
+    complete_analysis for values, stability and frequency and iter_analysis
+    for limits and engine.
+    """
+    with timings.activate() if timings is not None else nullcontext():
+        analysis_result, parts = analyze_graph_parts(nodes, edges, source, sink, fast, limits=limits,
+                                                     engine=engine)
+        return complete_analysis(analysis_result, parts, values, stability, frequency)
+
+def analyze_graph_parts(nodes, edges, source, sink, fast=False, timings=None, limits=None, engine="auto"):
+    """
+    The part of analyze_graph that does not depend on gain values: returns
+    the result without its "evaluation", "stability" and "frequency_response"
+    sections and the TransferFunctionParts needed to add them later with
+    complete_analysis. See iter_analysis for limits and engine.
+    """
+    with timings.activate() if timings is not None else nullcontext():
+        for event, payload in iter_analysis(nodes, edges, source, sink, fast, limits, engine):
+            if event == "result":
+                return payload
+
+def iter_analysis(nodes, edges, source, sink, fast=False, limits=None, engine="auto"):
+    """
+    Run the analysis step by step, yielding ("path", {"index", "nodes",
+    "gain"}) for each forward path and ("loop", {"index", "nodes", "gain"})
+    for each loop as they are found, then ("result", (result, parts)) as
+    analyze_graph_parts returns it. Loop indexes are discovery order; the
+    L1, L2, ... numbering of the result is assigned once all are known.
+
+    With EnumerationLimits, enumeration stops at the limits and, if it was
+    cut short, the result only has the paths and loops found plus a
+    "truncated" section: Mason's formula needs all of them, so there is no
+    determinant or transfer function and parts is None.
+
+    engine is "mason", "elimination" (solve the node equations, see
+    elimination.py; no paths or loops are reported) or "auto", which uses
+    Mason's formula when estimate_mason_work finds it tractable.
+    """
+    logger.debug("Analyzing graph from %s to %s", source, sink)
+
+    with timed_stage("graph_build"):
+        G = build_graph(nodes, edges)
+    draw_graph(G)
+
+    estimate = None
+    if engine == "auto":
+        with timed_stage("engine_choice"):
+            estimate = estimate_mason_work(G, source, sink)
+        engine = "mason" if estimate["tractable"] else "elimination"
+    if engine == "elimination":
+        from elimination import analyze_by_elimination
+        analysis_result, parts = analyze_by_elimination(G, source, sink, fast)
+        if estimate is not None:
+            analysis_result["mason_estimate"] = estimate
+        yield "result", (analysis_result, parts)
+        return
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r} (expected one of {', '.join(ENGINES)})")
+
+    # Find forward paths with edge information
+    forward_paths_info = []
+    paths = iter_forward_paths(G, source, sink)
+    if limits is not None:
+        paths = limits.take("paths", paths)
+    # Only the enumeration is timed, not the time the consumer of each event
+    # takes before asking for the next one
+    paths = iter(paths)
+    while True:
+        with timed_stage("path_enumeration"):
+            path_info = next(paths, None)
+            if path_info is None:
+                break
+            event = {
+                "index": len(forward_paths_info),
+                "nodes": path_info["path"],
+                "gain": str(calculate_edge_gain(G, path_info["edges_used"]))
+            }
+            forward_paths_info.append(path_info)
+        yield "path", event
+
+    loops = []
+    loop_edges = []
+    found = enumerate_loops(G)
+    if limits is not None:
+        found = limits.take("loops", found)
+    found = iter(found)
+    while True:
+        with timed_stage("loop_enumeration"):
+            loop_info = next(found, None)
+            if loop_info is None:
+                break
+            loop, edge_ids = loop_info
+            event = {
+                "index": len(loops),
+                "nodes": loop,
+                "gain": str(calculate_edge_gain(G, edge_ids))
+            }
+            loops.append(loop)
+            loop_edges.append(edge_ids)
+        yield "loop", event
+    with timed_stage("loop_enumeration"):
+        loops, loop_edges = sort_loops(G, loops, loop_edges)
+        loop_gains = [calculate_edge_gain(G, edge_ids) for edge_ids in loop_edges]
+
+    record_count("nodes", len(nodes))
+    record_count("edges", len(edges))
+    record_count("paths", len(forward_paths_info))
+    record_count("loops", len(loops))
+    logger.info("Analyzing %d nodes, %d edges: %d forward paths, %d loops",
+                len(nodes), len(edges), len(forward_paths_info), len(loops))
+
+    if limits is not None and limits.truncated:
+        logger.info("Enumeration truncated: %s", limits.truncated)
+        yield "result", (truncated_analysis(G, forward_paths_info, loops, loop_gains, limits.truncated), None)
+    else:
+        yield "result", build_analysis(G, forward_paths_info, loops, loop_gains, fast)
+
+def truncated_analysis(G, forward_paths_info, loops, loop_gains, truncated):
+    """Result for an enumeration cut short: the paths and loops found so far"""
+    path_mapping = {i: f"P{i+1}" for i in range(len(forward_paths_info))}
+    return {
+        "forward_paths": [
+            {
+                "id": path_mapping[i],
+                "nodes": path_info["path"],
+                "display": format_path_for_display(path_info["path"])
+            } for i, path_info in enumerate(forward_paths_info)
+        ],
+        "forward_path_gains": calculate_forward_path_gains(G, forward_paths_info, path_mapping),
+        "loops": [
+            {
+                "id": f"L{i+1}",
+                "nodes": loop,
+                "display": format_path_for_display(loop)
+            } for i, loop in enumerate(loops)
+        ],
+        "loop_gains": [str(gain) for gain in loop_gains],
+        "truncated": truncated
+    }
+
+def complete_analysis(analysis_result, parts, values=None, stability=None, frequency=None):
+    """
+    Add the gain-value dependent sections to a result from build_analysis:
+    "evaluation" when values are given, "stability" when stability is true,
+    or a {"variable": ...} dict naming the Laplace variable (default s), and
+    "frequency_response" when frequency is true or a grid spec (see
+    TransferFunctionParts.frequency_response). analysis_result is not
+    modified, and is returned as is when it was truncated (parts is None).
+    """
+    if parts is None or (not values and not stability and not frequency):
+        return analysis_result
+    if values:
+        check_values(values)
+    analysis_result = dict(analysis_result)
+    if values:
+        # Numeric answer from the lambdify-compiled transfer function
+        with timed_stage("evaluation"):
+            analysis_result["evaluation"] = parts.evaluate(values)
+    if stability:
+        variable = stability.get("variable", "s") if isinstance(stability, dict) else "s"
+        with timed_stage("stability"):
+            analysis_result["stability"] = parts.stability(values, variable)
+    if frequency:
+        with timed_stage("frequency_response"):
+            analysis_result["frequency_response"] = parts.frequency_response(frequency, values)
+    return analysis_result
+
+def summarize_analysis(G, forward_paths_info, loops, loop_gains, fast=False, values=None, model=None,
+                       stability=None, frequency=None):
+    """Build the complete /analyze result from the graph's forward paths and loops"""
+    analysis_result, parts = build_analysis(G, forward_paths_info, loops, loop_gains, fast, model)
+    return complete_analysis(analysis_result, parts, values, stability, frequency)
+
+def build_analysis(G, forward_paths_info, loops, loop_gains, fast=False, model=None):
+    """
+    Build the /analyze result from the graph's forward paths and loops,
+    without the gain-value dependent sections; returns it together with the
+    transfer function's TransferFunctionParts.
+    """
+    # Create mappings for paths and loops
+    path_mapping = {i: f"P{i+1}" for i in range(len(forward_paths_info))}
+    loop_mapping = {i: f"L{i+1}" for i in range(len(loops))}
+    
+    # Log paths and loops with their labels
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, path_info in enumerate(forward_paths_info):
+            logger.debug("Forward path %s: %s", path_mapping[i], format_path_for_display(path_info['path']))
+        for i, loop in enumerate(loops):
+            logger.debug("Loop %s: %s (gain %s)", loop_mapping[i], format_path_for_display(loop), loop_gains[i])
+
+    # Calculate detailed information
+    forward_path_gains = calculate_forward_path_gains(G, forward_paths_info, path_mapping)
+
+    with timed_stage("determinant"):
+        # Loop groups and determinants are shared by everything computed below
+        if model is None:
+            model = LoopInteractionModel(G, loops, loop_gains, simplify=not fast)
+        record_count("non_touching_groups", sum(len(groups) for groups in model.groups.values()))
+        record_count("loop_components", len(model.component_loops))
+
+        # Calculate determinant with symbolic mapping
+        determinant = calculate_determinant(G, loops, loop_mapping, model=model)
+        logger.debug("Determinant (Δ): %s", determinant['expression'] if isinstance(determinant, dict) else determinant)
+
+        # Calculate path determinants
+        path_determinants = []
+        for i, path_info in enumerate(forward_paths_info):
+            path = path_info["path"]
+            delta_k = calculate_path_determinant(G, path, loops, loop_mapping, model=model)
+            path_determinants.append({
+                "path_id": path_mapping[i],
+                "path": path,
+                "determinant": delta_k['expression'] if isinstance(delta_k, dict) else str(delta_k)
+            })
+
+    # Calculate transfer function with symbolic mapping
+    with timed_stage("transfer_function"):
+        transfer_function = calculate_transfer_function(G, forward_paths_info, loops, path_mapping, loop_mapping, model)
+    if isinstance(transfer_function, dict):
+        tf_expression = transfer_function["expression"]
+        tf_numeric = str(transfer_function["numeric_value"])
+        tf_numerator = transfer_function["numerator"]
+        tf_denominator = transfer_function["denominator"]
+    else:
+        tf_expression = str(transfer_function)
+        tf_numeric = str(transfer_function)
+        # Without forward paths (T = 0) or without loops (Δ = 1); either way
+        # the denominator is still Δ, which stability is computed from
+        tf_numerator, tf_denominator = transfer_function, model.determinant()
+    logger.debug("Transfer function: %s = %s", tf_expression, tf_numeric)
+    loop_gains_str = [str(gain) for gain in loop_gains]
+
+    analysis_result = {
+        "forward_paths": [
+            {
+                "id": path_mapping[i],
+                "nodes": path_info["path"],
+                "display": format_path_for_display(path_info["path"])
+            } for i, path_info in enumerate(forward_paths_info)
+        ],
+        "forward_path_gains": forward_path_gains,
+        "loops": [
+            {
+                "id": loop_mapping[i],
+                "nodes": loop,
+                "display": format_path_for_display(loop[:-1] + [loop[-1]])
+            } for i, loop in enumerate(loops)
+        ],
+        "loop_gains": loop_gains_str,
+        "determinant": {
+            "expression": determinant['expression'] if isinstance(determinant, dict) else str(determinant),
+            "numeric_value": str(determinant['numeric_value'] if isinstance(determinant, dict) else determinant)
+        },
+        "path_determinants": path_determinants,
+        "transfer_function": {
+            "expression": tf_expression,
+            "numeric_value": str(tf_numeric)
+        }
+    }
+    if fast:
+        analysis_result["transfer_function"]["numerator"] = str(tf_numerator)
+        analysis_result["transfer_function"]["denominator"] = str(tf_denominator)
+
+    return analysis_result, TransferFunctionParts(tf_numerator, tf_denominator, model.groups, edge_denominator(G))
+
+class AnalysisTimeout(Exception):
+    """Raised inside a worker when one graph's analysis runs past its timeout"""
+
+def _raise_analysis_timeout(signum, frame):
+    raise AnalysisTimeout()
+
+def load_analysis_modules():
+    """
+    Import sympy, networkx and NumPy now instead of on first use. Worker
+    processes call this before any deadline is armed (it is also their pool
+    initializer): an alarm that interrupts an import leaves a
+    half-initialized module behind, which breaks every later analysis in
+    that process.
+    """
+    for module in (sp, nx, np):
+        module.load()
+
+@contextmanager
+def analysis_deadline(timeout):
+    """
+    Raise AnalysisTimeout inside the block once timeout seconds have passed.
+    Enforced with SIGALRM where available, which only works in a process's
+    main thread; elsewhere the block runs without a deadline. The deadline
+    only covers the analysis: the modules it needs are imported first.
+    """
+    use_alarm = (timeout and hasattr(signal, 'setitimer')
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        load_analysis_modules()
+        previous_handler = signal.signal(signal.SIGALRM, _raise_analysis_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def analyze_one(payload, timeout=None):
+    """
+    Analyze one /analyze payload, returning {"result": ...} or {"error": ...}
+    instead of raising. This is the batch worker entry point; the timeout is
+    enforced with analysis_deadline. If the payload sets "timings", the
+    result carries StageTimings.as_dict().
+    """
+    try:
+        with analysis_deadline(timeout):
+            timings = StageTimings() if payload.get('timings') else None
+            result = run_analysis(payload, timings)
+        if timings is not None:
+            result["timings"] = timings.as_dict()
+        return {"result": result}
+    except AnalysisTimeout:
+        return {"error": f"Analysis exceeded the {timeout}s timeout", "timed_out": True}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+def analyze_parts_one(payload, timeout=None):
+    """
+    Worker entry point for the value-independent part of one /analyze
+    payload: returns ((result, parts), timings) from analyze_graph_parts,
+    raising AnalysisTimeout if it runs past timeout seconds.
+    """
+    timings = StageTimings()
+    with analysis_deadline(timeout):
+        entry = analyze_graph_parts(
+            payload.get('nodes', []), payload.get('edges', []),
+            payload.get('sourceNode', 'S1'), payload.get('destNode', 'S4'),
+            fast=payload.get('mode', 'full') == 'fast', timings=timings,
+            limits=EnumerationLimits.from_request(payload), engine=payload.get('engine', 'auto')
+        )
+    return entry, timings
+
+def analyze_batch(payloads, timeout=None, executor=None, max_workers=None):
+    """
+    Analyze many payloads on a process pool, yielding {"index": i, ...} with
+    the outcome of analyze_one for each payload in completion order. A failing
+    or timed-out graph only produces an error entry for itself. A pool is
+    created (and shut down afterwards) unless executor is given.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=load_analysis_modules)
+    futures = {}
+    try:
+        for i, payload in enumerate(payloads):
+            futures[executor.submit(analyze_one, payload, timeout)] = i
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except BrokenProcessPool as e:
+                outcome = {"error": f"Worker process died: {e}", "crashed": True}
+            except Exception as e:
+                outcome = {"error": f"{type(e).__name__}: {e}"}
+            yield {"index": futures[future], **outcome}
+    finally:
+        # Stop queued work if the consumer went away early
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+class AnalysisSession:
+    """
+    Server-side state of one editor session: the built graph with its forward
+    paths and loops (and the edges each one uses). Single-edge edits update
+    that state in place, so only the work an edit affects is redone:
+    a label change re-evaluates gains, adding an edge only searches for the
+    paths and loops through it, and removing one drops those that used it.
+    """
+
+    def __init__(self, data):
+        self.source = data.get('sourceNode', 'S1')
+        self.sink = data.get('destNode', 'S4')
+        self.fast = data.get('mode', 'full') == 'fast'
+        self.values = data.get('values')
+        self.stability = data.get('stability')
+        self.frequency = data.get('frequency_response')
+        edges = data.get('edges', [])
+        self.G = build_graph(data.get('nodes', []), edges)
+        self.next_edge = len(edges)
+        self.lock = threading.Lock()
+
+        self.paths = find_forward_paths(self.G, self.source, self.sink)
+        self.loops, self.loop_edges = find_loop_edges(self.G)
+        self.loop_gains = [calculate_edge_gain(self.G, ids) for ids in self.loop_edges]
+        self.model = None
+        self._refresh()
+
+    def apply_edits(self, edits):
+        """
+        Apply a list of edits all or nothing: if one fails, the session is put
+        back as it was before the first and the error is raised. Returns the
+        ids of the added edges.
+        """
+        saved = (self.G.copy(), self.next_edge, list(self.paths), list(self.loops),
+                 list(self.loop_edges), list(self.loop_gains), self.model, self.result)
+        added = []
+        try:
+            for edit in edits:
+                edge_id = self.apply_edit(edit)
+                if edge_id is not None:
+                    added.append(edge_id)
+        except Exception:
+            (self.G, self.next_edge, self.paths, self.loops,
+             self.loop_edges, self.loop_gains, self.model, self.result) = saved
+            # Label updates change the GraphIndex in place, so it is rebuilt
+            self.G.graph['index'] = GraphIndex(self.G)
+            raise
+        return added
+
+    def apply_edit(self, edit):
+        """Apply one edit: {"op": "update" | "add" | "remove", ...}"""
+        if not isinstance(edit, dict):
+            raise ValueError(f"An edit is an object, not {edit!r}")
+        op = edit.get('op')
+        if op == 'update':
+            self.update_label(edit['id'], edit['label'])
+        elif op == 'add':
+            return self.add_edge(edit['source'], edit['target'], edit['label'])
+        elif op == 'remove':
+            self.remove_edge(edit['id'])
+        else:
+            raise ValueError(f"Unknown edge edit op: {op!r}")
+
+    def update_label(self, edge_id, label):
+        """Change an edge's gain; paths, loops and loop groups stay as they are"""
+        index = graph_index(self.G)
+        u, v, _ = index.edges[edge_id]
+        weight = sp.sympify(label)
+        self.G.edges[u, v, index.edge_keys[edge_id]]['weight'] = weight
+        index.set_weight(edge_id, weight)
+        for i, edge_ids in enumerate(self.loop_edges):
+            if edge_id in edge_ids:
+                self.loop_gains[i] = calculate_edge_gain(self.G, edge_ids)
+        self._refresh(groups_changed=False)
+
+    def add_edge(self, source, target, label):
+        """Add an edge and only the forward paths and loops that run through it"""
+        edge_id = f"edge_{self.next_edge}"
+        self.next_edge += 1
+        self.G.add_edge(source, target, weight=sp.sympify(label), id=edge_id)
+        self.G.graph['index'] = GraphIndex(self.G)
+
+        self.paths = sort_forward_paths(
+            self.G, self.paths + find_paths_through_edge(self.G, self.source, self.sink, edge_id)
+        )
+        new_loops, new_edges = find_loops_through_edge(self.G, edge_id)
+        self.loops, self.loop_edges = sort_loops(
+            self.G, self.loops + new_loops, self.loop_edges + new_edges
+        )
+        self.loop_gains = [calculate_edge_gain(self.G, ids) for ids in self.loop_edges]
+        self._refresh()
+        return edge_id
+
+    def remove_edge(self, edge_id):
+        """Remove an edge and drop the forward paths and loops that used it"""
+        index = graph_index(self.G)
+        u, v, _ = index.edges[edge_id]
+        self.G.remove_edge(u, v, index.edge_keys[edge_id])
+        self.G.graph['index'] = GraphIndex(self.G)
+
+        self.paths = [info for info in self.paths if edge_id not in info["edges_used"]]
+        kept = [i for i, edge_ids in enumerate(self.loop_edges) if edge_id not in edge_ids]
+        self.loops = [self.loops[i] for i in kept]
+        self.loop_edges = [self.loop_edges[i] for i in kept]
+        self.loop_gains = [self.loop_gains[i] for i in kept]
+        self._refresh()
+
+    def _refresh(self, groups_changed=True):
+        """Recompute Δ, every Δk and the transfer function from the current state"""
+        groups = None if groups_changed or self.model is None else self.model.groups
+        self.model = LoopInteractionModel(self.G, self.loops, self.loop_gains,
+                                          simplify=not self.fast, groups=groups)
+        self.result = summarize_analysis(self.G, self.paths, self.loops, self.loop_gains,
+                                         self.fast, self.values, self.model, self.stability,
+                                         self.frequency)
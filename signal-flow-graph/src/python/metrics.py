@@ -0,0 +1,74 @@
+import threading
+
+class AnalysisMetrics:
+    """
+    Process-wide analysis metrics rendered in the Prometheus text format:
+    request counts, a duration histogram per analysis stage and running
+    totals of the items (paths, loops, non-touching groups) processed.
+    """
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analyses = {"computed": 0, "cached": 0, "too_complex": 0, "rejected": 0}
+        self.stage_buckets = {}  # stage -> cumulative counts per bucket
+        self.stage_sum = {}      # stage -> total seconds
+        self.stage_count = {}    # stage -> observations
+        self.item_totals = {}    # item kind -> total count
+
+    def observe(self, timings, cached=False):
+        """Record one analysis from its StageTimings"""
+        with self._lock:
+            self.analyses["cached" if cached else "computed"] += 1
+            for stage, seconds in timings.stages.items():
+                buckets = self.stage_buckets.setdefault(stage, [0] * len(self.BUCKETS))
+                for i, bound in enumerate(self.BUCKETS):
+                    if seconds <= bound:
+                        buckets[i] += 1
+                self.stage_sum[stage] = self.stage_sum.get(stage, 0.0) + seconds
+                self.stage_count[stage] = self.stage_count.get(stage, 0) + 1
+            for kind, value in timings.counts.items():
+                self.item_totals[kind] = self.item_totals.get(kind, 0) + value
+
+    def count(self, outcome):
+        """Count an analysis that produced no timings (too complex, or rejected when busy)"""
+        with self._lock:
+            self.analyses[outcome] += 1
+
+    def render(self, cache_stats=None):
+        """Prometheus exposition text, optionally including AnalysisCache.stats()"""
+        lines = [
+            "# HELP sfg_analyses_total Analyses served, by outcome.",
+            "# TYPE sfg_analyses_total counter",
+        ]
+        with self._lock:
+            for outcome, value in self.analyses.items():
+                lines.append(f'sfg_analyses_total{{outcome="{outcome}"}} {value}')
+
+            lines.append("# HELP sfg_stage_seconds Wall-clock time per analysis stage.")
+            lines.append("# TYPE sfg_stage_seconds histogram")
+            for stage, buckets in sorted(self.stage_buckets.items()):
+                for bound, value in zip(self.BUCKETS, buckets):
+                    lines.append(f'sfg_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {value}')
+                lines.append(f'sfg_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self.stage_count[stage]}')
+                lines.append(f'sfg_stage_seconds_sum{{stage="{stage}"}} {self.stage_sum[stage]}')
+                lines.append(f'sfg_stage_seconds_count{{stage="{stage}"}} {self.stage_count[stage]}')
+
+            lines.append("# HELP sfg_items_total Items processed by computed analyses.")
+            lines.append("# TYPE sfg_items_total counter")
+            for kind, value in sorted(self.item_totals.items()):
+                lines.append(f'sfg_items_total{{kind="{kind}"}} {value}')
+
+        if cache_stats is not None:
+            lines.append("# TYPE sfg_cache_hits_total counter")
+            lines.append(f"sfg_cache_hits_total {cache_stats['hits']}")
+            lines.append("# TYPE sfg_cache_misses_total counter")
+            lines.append(f"sfg_cache_misses_total {cache_stats['misses']}")
+            lines.append("# TYPE sfg_cache_evictions_total counter")
+            lines.append(f"sfg_cache_evictions_total {cache_stats['evictions']}")
+            lines.append("# TYPE sfg_cache_entries gauge")
+            lines.append(f"sfg_cache_entries {cache_stats['entries']}")
+            lines.append("# TYPE sfg_cache_bytes gauge")
+            lines.append(f"sfg_cache_bytes {cache_stats['bytes']}")
+        return "\n".join(lines) + "\n"
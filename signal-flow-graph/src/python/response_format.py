@@ -0,0 +1,143 @@
+"""
+Shaping and encoding of /analyze requests and responses.
+
+A client can ask for only some sections of a result ("sections"), and for
+a columnar layout ("format": "columnar"). The columnar layout keeps node
+names and expressions once in a shared string table; paths, loops, gains
+and path determinants are parallel arrays of indices into it, without the
+repeated node lists and display strings. Through content negotiation the
+body is MessagePack instead of JSON (Accept: application/x-msgpack) and
+gzip or brotli compressed (Accept-Encoding). Requests may be sent the same
+way. msgpack and brotli are optional: without them those encodings are
+simply never chosen.
+"""
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+
+# Result sections a client can select; other keys (engine, truncated, timings,
+# ...) describe the result as a whole and are always sent
+SECTIONS = (
+    "forward_paths", "forward_path_gains", "loops", "loop_gains", "determinant",
+    "path_determinants", "transfer_function", "evaluation", "stability", "frequency_response",
+)
+FORMATS = ("nested", "columnar")
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+def check_shape(data):
+    """Raise ValueError if the payload asks for unknown sections or an unknown format"""
+    if not isinstance(data, dict):
+        raise ValueError("The request body must be an object")
+    sections = data.get('sections')
+    if sections is not None:
+        if not isinstance(sections, list):
+            raise ValueError("sections is a list of result section names")
+        unknown = [name for name in sections if name not in SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown result sections {unknown!r}; choose from {', '.join(SECTIONS)}")
+    if data.get('format', 'nested') not in FORMATS:
+        raise ValueError(f"Unknown result format {data['format']!r} (expected 'nested' or 'columnar')")
+
+def shape_result(result, data):
+    """The result in the sections and format the payload asks for (see check_shape)"""
+    sections = data.get('sections')
+    if sections is not None:
+        result = {key: value for key, value in result.items() if key not in SECTIONS or key in sections}
+    if data.get('format') == 'columnar':
+        result = to_columnar(result)
+    return result
+
+def to_columnar(result):
+    """
+    Columnar form of a result: node names and expressions become indices
+    into result["strings"], and the path and loop sections become parallel
+    arrays ("id", "nodes", "gain", ...) aligned by position. Display
+    strings and the node lists repeated in forward_path_gains and
+    path_determinants are dropped, as they follow from the rest.
+    """
+    strings = []
+    positions = {}
+
+    def intern(value):
+        position = positions.get(value)
+        if position is None:
+            position = positions[value] = len(strings)
+            strings.append(value)
+        return position
+
+    columnar = dict(result, format="columnar")
+    for key in ("forward_paths", "loops"):
+        if key in result:
+            columnar[key] = {
+                "id": [entry["id"] for entry in result[key]],
+                "nodes": [[intern(node) for node in entry["nodes"]] for entry in result[key]],
+            }
+    if "forward_path_gains" in result:
+        columnar["forward_path_gains"] = {
+            "id": [entry["id"] for entry in result["forward_path_gains"]],
+            "gain": [intern(entry["gain"]) for entry in result["forward_path_gains"]],
+        }
+    if "loop_gains" in result:
+        columnar["loop_gains"] = [intern(gain) for gain in result["loop_gains"]]
+    if "path_determinants" in result:
+        columnar["path_determinants"] = {
+            "path_id": [entry["path_id"] for entry in result["path_determinants"]],
+            "determinant": [intern(entry["determinant"]) for entry in result["path_determinants"]],
+        }
+    columnar["strings"] = strings
+    return columnar
+
+def negotiate(accept_mimetypes, accept_encodings):
+    """(mimetype, content encoding or None) for a request's Accept and Accept-Encoding headers"""
+    mimetypes = [JSON, MSGPACK] if msgpack is not None else [JSON]
+    encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return accept_mimetypes.best_match(mimetypes, default=JSON), accept_encodings.best_match(encodings)
+
+def encode_body(body, mimetype=JSON, encoding=None):
+    """
+    Serialize body as mimetype and compress it with encoding if it is large
+    enough to be worth it. Returns (bytes, the encoding applied or None).
+    """
+    if mimetype == MSGPACK:
+        data = msgpack.packb(body, use_bin_type=True)
+    else:
+        data = json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if encoding is None or len(data) < MIN_COMPRESS_BYTES:
+        return data, None
+    if encoding == "br":
+        return brotli.compress(data, quality=5), encoding
+    return gzip.compress(data, compresslevel=6), encoding
+
+def decode_body(data, content_type=None, content_encoding=None):
+    """
+    Parse a request body sent as JSON or MessagePack, optionally gzip or
+    brotli compressed. Raises ValueError for a body that cannot be read.
+    """
+    content_encoding = (content_encoding or "identity").lower()
+    try:
+        if content_encoding == "gzip":
+            data = gzip.decompress(data)
+        elif content_encoding == "br" and brotli is not None:
+            data = brotli.decompress(data)
+        elif content_encoding != "identity":
+            raise ValueError(f"Unsupported Content-Encoding {content_encoding!r}")
+        if (content_type or "").split(";")[0].strip() in (MSGPACK, "application/msgpack"):
+            if msgpack is None:
+                raise ValueError("MessagePack requests need the msgpack package on the server")
+            return msgpack.unpackb(data, raw=False)
+        return json.loads(data)
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        raise ValueError(f"Unreadable request body: {e}") from e
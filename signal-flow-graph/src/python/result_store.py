@@ -0,0 +1,94 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from mason import TransferFunctionParts
+
+class ResultStore:
+    """
+    Persistent store of analyses in a SQLite file, keyed by analysis_key, so
+    a restarted server or a later CLI run can answer for graphs it has seen.
+    Each row holds the result and its TransferFunctionParts record (the
+    numerator, denominator, non-touching groups and characteristic
+    polynomial coefficients) as zlib-compressed JSON. Rows older than
+    max_age seconds are dropped, and the least recently used ones go first
+    once the stored payloads exceed max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # One connection shared by the threads of this process; other
+        # processes (gunicorn workers, CLI runs) rely on SQLite's locking
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed)")
+
+    def get(self, key):
+        """Return the stored (result, parts) for key, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, created FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.max_age is not None and row[1] < now - self.max_age:
+                self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE analyses SET accessed = ? WHERE key = ?", (now, key))
+        record = json.loads(zlib.decompress(row[0]))
+        return record["result"], TransferFunctionParts.from_record(record["parts"])
+
+    def put(self, key, entry):
+        """Store a (result, parts) entry under key, then evict to stay within bounds"""
+        result, parts = entry
+        record = {"result": result, "parts": parts.to_record()}
+        payload = zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.max_age is not None:
+            self._db.execute("DELETE FROM analyses WHERE created < ?", (now - self.max_age,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._db.execute("SELECT key, size FROM analyses ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM analyses WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM analyses")
+
+    def stats(self):
+        """Row count and stored bytes, as exposed on /stats"""
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses").fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,325 @@
+"""
+Routh-Hurwitz stability analysis.
+
+routh_table builds the Routh array with exact sympy arithmetic, handling a
+zero first element (replaced by ε -> 0+) and an all-zero row (replaced by
+the derivative of the auxiliary polynomial). The ε rule cannot see roots on
+the jω axis, so when it is needed the root locations are counted another
+way (root_counts). routh_sweep builds the tables for a whole grid of
+parameter values at once with NumPy.
+"""
+from lazy_modules import LazyModule
+
+sp = LazyModule("sympy")
+np = LazyModule("numpy")
+
+EPSILON = "epsilon"
+
+def parse_coefficients(coefficients=None, polynomial=None, variable="s"):
+    """
+    Characteristic polynomial coefficients, highest power first, as exact
+    sympy values. Either give the coefficients (numbers or expression
+    strings such as "2+K") or the polynomial as a string in variable.
+    Floats are converted to the rational number they are written as.
+    """
+    if polynomial is not None:
+        s = sp.Symbol(variable)
+        expr = sp.nsimplify(sp.sympify(polynomial, locals={variable: s}), rational=True)
+        coeffs = sp.Poly(sp.expand(expr), s).all_coeffs()
+    else:
+        coeffs = [sp.nsimplify(sp.sympify(c), rational=True) for c in coefficients or []]
+    # Leading zeros do not change the polynomial
+    while coeffs and coeffs[0] == 0:
+        coeffs = coeffs[1:]
+    if not coeffs:
+        raise ValueError("The characteristic polynomial is empty or identically zero")
+    return coeffs
+
+def _sign_near_zero(expr, eps):
+    """Sign of expr as ε -> 0+ (exact for rational functions of ε)"""
+    if not expr.has(eps):
+        return int(sp.sign(expr))
+    num, den = sp.fraction(sp.together(expr))
+    sign = 1
+    for part in (num, den):
+        lowest = sp.Poly(part, eps).terms()[-1][1]  # coefficient of the lowest power of ε
+        sign *= int(sp.sign(lowest))
+    return sign
+
+def _sign_changes(signs):
+    return sum(1 for a, b in zip(signs, signs[1:]) if a != b)
+
+def routh_table(coefficients):
+    """
+    Exact Routh array of a polynomial given by its coefficients (highest
+    power first, any values parse_coefficients accepts). Returns a dict with
+    the table, its first column, the special cases met and, when the
+    coefficients are numeric, the sign changes and root-location counts
+    (None when a zero first element meets irrational coefficients, which
+    root_counts cannot handle). With exactly one free symbol the range of it that makes the system
+    stable is included instead.
+    """
+    coeffs = parse_coefficients(coefficients)
+    degree = len(coeffs) - 1
+    rows, special_cases, aux_row, eps = _routh_rows(coeffs)
+
+    first_column = [row[0] for row in rows]
+    result = {
+        "degree": degree,
+        "table": [[str(entry) for entry in row] for row in rows],
+        "first_column": [str(entry) for entry in first_column],
+        "special_cases": special_cases,
+    }
+
+    free_symbols = set().union(*(entry.free_symbols for entry in first_column)) - {eps}
+    if not free_symbols:
+        signs = [_sign_near_zero(entry, eps) for entry in first_column]
+        rhp = _sign_changes(signs)
+        jw = 0
+        if special_cases and all(c.is_Rational for c in coeffs):
+            # The ε rule miscounts when there are also jω roots: count exactly
+            rhp, jw = root_counts(coeffs)
+        elif any(case["case"] == "zero_first_element" for case in special_cases):
+            rhp = jw = None
+        elif aux_row is not None:
+            aux_degree = degree - aux_row
+            # Roots of the auxiliary polynomial are symmetric about the origin:
+            # the sign changes from its row down are its right-half-plane roots
+            jw = aux_degree - 2 * _sign_changes(signs[aux_row:])
+        determined = rhp is not None
+        result.update({
+            "sign_changes": _sign_changes(signs),
+            "rhp_roots": rhp,
+            "jw_roots": jw,
+            "lhp_roots": degree - rhp - jw if determined else None,
+            "stable": rhp == 0 and jw == 0 if determined else None,
+            "marginally_stable": rhp == 0 and jw > 0 if determined else None,
+        })
+    elif len(free_symbols) == 1 and not special_cases:
+        symbol = free_symbols.pop()
+        result["parameter"] = symbol.name
+        result["stable_range"] = str(stable_parameter_range(first_column, symbol))
+    return result
+
+def _routh_rows(coeffs):
+    """
+    Rows of the Routh array of coeffs, with the special cases met, the
+    index of the row the first auxiliary polynomial came from (or None) and
+    the ε symbol zero first elements were replaced by
+    """
+    degree = len(coeffs) - 1
+    width = degree // 2 + 1
+    eps = sp.Symbol(EPSILON, positive=True)
+
+    rows = [
+        coeffs[0::2] + [sp.Integer(0)] * (width - len(coeffs[0::2])),
+        coeffs[1::2] + [sp.Integer(0)] * (width - len(coeffs[1::2])),
+    ][:degree + 1]
+    special_cases = []
+    aux_row = None
+
+    def normalize(r):
+        """Apply the all-zero-row and zero-first-element rules to row r"""
+        nonlocal aux_row
+        row = rows[r]
+        if all(entry == 0 for entry in row):
+            # Replace by the derivative of the auxiliary polynomial of the row above
+            power = degree - (r - 1)
+            above = rows[r - 1]
+            rows[r] = [sp.Integer(power - 2 * i) * above[i] if power - 2 * i > 0 else sp.Integer(0)
+                       for i in range(width)]
+            aux = sum(above[i] * sp.Symbol("s") ** (power - 2 * i) for i in range(width) if power - 2 * i >= 0)
+            special_cases.append({"row": r, "case": "all_zero_row", "auxiliary_polynomial": str(aux)})
+            if aux_row is None:
+                aux_row = r - 1
+            row = rows[r]
+        if row[0] == 0:
+            row[0] = eps
+            special_cases.append({"row": r, "case": "zero_first_element"})
+
+    if degree >= 1:
+        normalize(1)
+    for r in range(2, degree + 1):
+        prev, cur = rows[r - 2], rows[r - 1]
+        rows.append([
+            sp.cancel((cur[0] * prev[i + 1] - prev[0] * cur[i + 1]) / cur[0]) for i in range(width - 1)
+        ] + [sp.Integer(0)])
+        normalize(r)
+    return rows, special_cases, aux_row, eps
+
+def root_counts(coeffs):
+    """
+    Exact (right-half-plane, jω-axis) root counts of a polynomial with
+    rational coefficients, highest power first. Roots whose mirror image
+    -r is also a root are split off as gcd(p(s), p(-s)), an even
+    polynomial q(s²) whose jω roots are the negative real roots of q. What
+    is left has no such roots, so its Routh array (ε rule included) counts
+    its right-half-plane roots correctly.
+    """
+    s, u = sp.Symbol("s"), sp.Symbol("u")
+    coeffs = list(coeffs)
+    zeros = 0  # roots at s = 0
+    while len(coeffs) > 1 and coeffs[-1] == 0:
+        coeffs.pop()
+        zeros += 1
+    p = sp.Poly(coeffs, s)
+    mirrored = sp.Poly([c * (-1) ** i for i, c in enumerate(reversed(coeffs))][::-1], s)
+    symmetric = p.gcd(mirrored)
+    rest = p.exquo(symmetric)
+
+    # symmetric has no root at 0, so it is even: q(s²) with q = every other coefficient
+    q = sp.Poly(symmetric.all_coeffs()[::2], u)
+    jw_pairs = sum(multiplicity * factor.count_roots(None, 0) for factor, multiplicity in q.sqf_list()[1])
+    # The other symmetric roots come in ±r pairs, one of each in the right half-plane
+    rhp = (symmetric.degree() - 2 * jw_pairs) // 2
+    if rest.degree() > 0:
+        rows, _, _, eps = _routh_rows(rest.all_coeffs())
+        rhp += _sign_changes([_sign_near_zero(row[0], eps) for row in rows])
+    return int(rhp), int(zeros + 2 * jw_pairs)
+
+def stable_parameter_range(first_column, symbol):
+    """
+    Real values of symbol for which every first-column entry has the same
+    strict sign, i.e. for which the system is asymptotically stable.
+    """
+    real = sp.Symbol(symbol.name, real=True)
+    column = [entry.subs(symbol, real) for entry in first_column]
+    ranges = []
+    for relation in (sp.StrictGreaterThan, sp.StrictLessThan):
+        allowed = sp.S.Reals
+        for entry in column:
+            allowed = allowed.intersect(
+                sp.solve_univariate_inequality(relation(entry, 0), real, relational=False)
+            )
+        ranges.append(allowed)
+    return sp.Union(*ranges)
+
+def _sweep_values(spec):
+    """A parameter's values: a list, or {"start", "stop", "num"} for linspace"""
+    if isinstance(spec, dict):
+        if "start" not in spec or "stop" not in spec:
+            raise ValueError(f"A sweep range needs start and stop, not {spec!r}")
+        return np.linspace(spec["start"], spec["stop"], int(spec.get("num", 100)))
+    return np.asarray(spec, dtype=float)
+
+def routh_sweep(coefficients, sweep, epsilon=1e-9):
+    """
+    Routh stability over a grid of parameter values, computed for every grid
+    point at once with NumPy. coefficients may contain the swept symbols;
+    sweep maps each symbol name to its values (see _sweep_values) and the
+    grid is their Cartesian product. A first-column entry that vanishes is
+    replaced by epsilon (relative to the largest coefficient) and an
+    all-zero row by the auxiliary polynomial's derivative, as in routh_table.
+
+    Returns columnar arrays (one entry per grid point) of the parameter
+    values, right-half-plane and jω root counts and stability, plus the
+    stable intervals when one parameter is swept, or the bounding box of the
+    stable points for several.
+    """
+    coeffs = parse_coefficients(coefficients)
+    names = sorted(sweep)
+    symbols = [sp.Symbol(name) for name in names]
+    axes = [_sweep_values(sweep[name]) for name in names]
+    grid = [axis.ravel() for axis in np.meshgrid(*axes, indexing="ij")] if axes else []
+    points = grid[0].size if grid else 1
+
+    # Coefficient matrix: one row per grid point
+    matrix = np.empty((points, len(coeffs)))
+    for j, coeff in enumerate(coeffs):
+        matrix[:, j] = np.broadcast_to(sp.lambdify(symbols, coeff, "numpy")(*grid), points)
+
+    degree = len(coeffs) - 1
+    width = degree // 2 + 1
+    tolerance = epsilon * np.maximum(np.abs(matrix).max(axis=1), 1e-300)
+
+    def padded(values):
+        row = np.zeros((points, width))
+        row[:, :values.shape[1]] = values
+        return row
+
+    first_column = np.empty((degree + 1, points))
+    aux_row = np.full(points, -1)  # row of the first auxiliary polynomial per point
+    epsilon_used = np.zeros(points, dtype=bool)  # a zero first element was replaced
+    rows = [padded(matrix[:, 0::2]), padded(matrix[:, 1::2])]
+
+    def normalize(r, row, above):
+        zero_row = np.all(np.abs(row) <= tolerance[:, None], axis=1)
+        if zero_row.any():
+            power = degree - (r - 1)
+            factors = np.array([max(power - 2 * i, 0) for i in range(width)], dtype=float)
+            row = np.where(zero_row[:, None], above * factors, row)
+            aux_row[:] = np.where(zero_row & (aux_row < 0), r - 1, aux_row)
+        small = np.abs(row[:, 0]) <= tolerance
+        epsilon_used[:] |= small
+        row[:, 0] = np.where(small, tolerance, row[:, 0])
+        return row
+
+    first_column[0] = rows[0][:, 0]
+    if degree >= 1:
+        rows[1] = normalize(1, rows[1], rows[0])
+        first_column[1] = rows[1][:, 0]
+    prev, cur = rows
+    for r in range(2, degree + 1):
+        new = np.zeros((points, width))
+        new[:, :-1] = (cur[:, :1] * prev[:, 1:] - prev[:, :1] * cur[:, 1:]) / cur[:, :1]
+        new = normalize(r, new, cur)
+        first_column[r] = new[:, 0]
+        prev, cur = cur, new
+
+    signs = np.sign(first_column)
+    changes = signs[1:] != signs[:-1]  # (degree, points)
+    rhp = changes.sum(axis=0)
+    # Sign changes at or below each point's auxiliary-polynomial row
+    below_aux = np.arange(1, degree + 1)[:, None] > aux_row[None, :]
+    jw = np.where(aux_row >= 0, (degree - aux_row) - 2 * (changes & below_aux).sum(axis=0), 0)
+    degenerate = np.abs(matrix[:, 0]) <= tolerance  # leading coefficient vanishes
+    # The ε rule miscounts when there are also jω roots, so the points that
+    # needed it are counted from their roots instead
+    for point in np.flatnonzero(epsilon_used & ~degenerate):
+        rhp[point], jw[point] = _numeric_root_counts(matrix[point], tolerance[point], epsilon)
+    stable = (rhp == 0) & (jw == 0) & ~degenerate
+
+    result = {
+        "degree": degree,
+        "points": points,
+        "parameters": {name: values.tolist() for name, values in zip(names, grid)},
+        "rhp_roots": rhp.tolist(),
+        "jw_roots": jw.tolist(),
+        "stable": stable.tolist(),
+        "degenerate": degenerate.tolist(),
+    }
+    if len(names) == 1:
+        result["stable_ranges"] = {names[0]: _stable_intervals(grid[0], stable)}
+    elif names and stable.any():
+        result["stable_bounds"] = {
+            name: [float(values[stable].min()), float(values[stable].max())]
+            for name, values in zip(names, grid)
+        }
+    return result
+
+def _numeric_root_counts(coefficients, tolerance, epsilon):
+    """
+    (right-half-plane, jω-axis) root counts from np.roots. A root counts as
+    on the axis within sqrt(epsilon) of its size, as repeated roots are only
+    found to about the square root of the working precision.
+    """
+    roots = np.roots(np.where(np.abs(coefficients) <= tolerance, 0, coefficients))
+    on_axis = np.abs(roots.real) <= np.sqrt(epsilon) * np.maximum(np.abs(roots), 1)
+    return int((roots.real > 0)[~on_axis].sum()), int(on_axis.sum())
+
+def _stable_intervals(values, stable):
+    """[first, last] value of each run of consecutive stable grid points"""
+    order = np.argsort(values, kind="stable")
+    values, stable = values[order], stable[order]
+    intervals = []
+    start = None
+    for value, ok in zip(values.tolist(), stable.tolist()):
+        if ok and start is None:
+            start = value
+        if not ok and start is not None:
+            intervals.append([start, last])
+            start = None
+        last = value
+    if start is not None:
+        intervals.append([start, last])
+    return intervals
@@ -0,0 +1,52 @@
+import pytest
+
+import SignalFlowGraphCalc as server
+
+GRAPH = {
+    "nodes": [{"id": node} for node in ("S1", "S2", "S4")],
+    "edges": [{"source": "S1", "target": "S2", "label": "G"},
+              {"source": "S2", "target": "S4", "label": "H"},
+              {"source": "S4", "target": "S2", "label": "-K"}],
+    "sourceNode": "S1",
+    "destNode": "S4",
+}
+
+def free_slots():
+    """How many ANALYSIS_SLOTS could be taken right now"""
+    taken = 0
+    while server.ANALYSIS_SLOTS.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        server.ANALYSIS_SLOTS.release()
+    return taken
+
+@pytest.fixture
+def client():
+    server.ANALYSIS_CACHE.clear()
+    return server.app.test_client()
+
+@pytest.mark.parametrize("field, value", [("budget", "abc"), ("budget", [1]), ("budget", "nan")])
+def test_rejected_payloads_give_back_their_slot(client, field, value):
+    for _ in range(server.MAX_CONCURRENT_ANALYSES + 1):
+        response = client.post("/analyze", json=dict(GRAPH, **{field: value}))
+        assert response.status_code == 400
+    assert free_slots() == server.MAX_CONCURRENT_ANALYSES
+    assert client.post("/analyze", json=GRAPH).status_code == 200
+
+def test_failed_analyses_give_back_their_slot(client):
+    bad_label = dict(GRAPH, edges=GRAPH["edges"] + [{"source": "S1", "target": "S4", "label": "1 +"}])
+    for _ in range(server.MAX_CONCURRENT_ANALYSES + 1):
+        assert client.post("/analyze", json=bad_label).status_code == 400
+    assert free_slots() == server.MAX_CONCURRENT_ANALYSES
+
+def test_no_free_slot_is_a_503(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_WAIT", 0)
+    taken = 0
+    while server.ANALYSIS_SLOTS.acquire(blocking=False):
+        taken += 1
+    try:
+        assert client.post("/analyze", json=GRAPH).status_code == 503
+        assert client.post("/sessions", json=GRAPH).status_code == 503
+    finally:
+        for _ in range(taken):
+            server.ANALYSIS_SLOTS.release()
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import SignalFlowGraphCalc as server
+
+GRAPH = {
+    "nodes": [{"id": "R"}, {"id": "Y"}],
+    "edges": [{"source": "R", "target": "Y", "label": "G"}],
+    "sourceNode": "R",
+    "destNode": "Y",
+}
+
+@pytest.mark.parametrize("body", [
+    ["not", "an", "object"],
+    {"graphs": GRAPH},
+    {"graphs": [GRAPH], "timeout": "abc"},
+    {"graphs": [GRAPH], "timeout": 0},
+])
+def test_malformed_batch_is_a_bad_request(body):
+    assert server.app.test_client().post("/analyze/batch", json=body).status_code == 400
+
+@pytest.mark.parametrize("timeout, expected", [
+    (None, server.BATCH_TIMEOUT), (5, 5), (server.BATCH_TIMEOUT * 10, server.BATCH_TIMEOUT),
+])
+def test_timeout_is_capped(timeout, expected):
+    assert server.batch_timeout({"timeout": timeout}) == expected
+
+def test_batch_streams_one_line_per_graph():
+    response = server.app.test_client().post("/analyze/batch", json={"graphs": [GRAPH] * 3, "timeout": None})
+    outcomes = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(outcome["index"] for outcome in outcomes) == [0, 1, 2]
+    assert all(outcome["result"]["transfer_function"]["numeric_value"] == "G" for outcome in outcomes)
+    server.BATCH_POOL.retire(server.get_batch_executor(), grace=0)
@@ -0,0 +1,44 @@
+import pytest
+import sympy as sp
+
+import mason
+from elimination import eliminate
+from SignalFlowGraphCalc import app
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+# s -> a -> t with a unity self-loop on a: every diagonal entry of I - A
+# that elimination can pivot on is zero, although Δ = -x*y is not
+ZERO_DIAGONAL = {
+    "nodes": [{"id": node} for node in ("s", "a", "t")],
+    "edges": [edge("s", "a", "1"), edge("a", "a", "1"), edge("a", "t", "x"), edge("t", "a", "y")],
+    "sourceNode": "s",
+    "destNode": "t",
+}
+
+def test_zero_diagonal_takes_an_off_diagonal_pivot():
+    G = mason.build_graph(ZERO_DIAGONAL["nodes"], ZERO_DIAGONAL["edges"])
+    numerator, determinant = eliminate(G, "s", "t")
+    x, y = sp.symbols("x y")
+    assert sp.simplify(determinant + x * y) == 0
+    assert sp.simplify(numerator / determinant + 1 / y) == 0
+
+@pytest.mark.parametrize("labels", [("x", "y"), ("2", "3")])
+def test_elimination_matches_mason(labels):
+    edges = [edge("s", "a", "1"), edge("a", "a", "1"), edge("a", "t", labels[0]), edge("t", "a", labels[1])]
+    results = [mason.analyze_graph(ZERO_DIAGONAL["nodes"], edges, "s", "t", engine=engine)
+               for engine in ("mason", "elimination")]
+    expected, actual = (sp.sympify(result["transfer_function"]["numeric_value"]) for result in results)
+    assert abs(complex(sp.simplify(expected - actual))) < 1e-9  # numeric gains are solved in floats
+
+def test_singular_equations_are_a_bad_request():
+    # A unity self-loop on the sink alone makes Δ = 0
+    payload = dict(ZERO_DIAGONAL, edges=[edge("s", "t", "g"), edge("t", "t", "1")], engine="elimination")
+    response = app.test_client().post("/analyze", json=payload)
+    assert response.status_code == 400
+    assert "singular" in response.get_json()["error"]
+
+def test_unknown_engine_is_a_bad_request():
+    response = app.test_client().post("/analyze", json=dict(ZERO_DIAGONAL, engine="bogus"))
+    assert response.status_code == 400
@@ -0,0 +1,33 @@
+import pytest
+
+import mason
+from SignalFlowGraphCalc import app
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+GRAPH = {
+    "nodes": [{"id": node} for node in ("S1", "S2", "S4")],
+    "edges": [edge("S1", "S2", "G"), edge("S2", "S4", "H"), edge("S4", "S2", "-K")],
+    "sourceNode": "S1",
+    "destNode": "S4",
+}
+
+def test_sweep_of_equal_length_lists():
+    result = mason.evaluate_transfer_function("G*H", "1 + H*K", {"G": [1, 2], "H": [1, 1], "K": 1})
+    assert result == {"value": [0.5, 1.0]}
+
+@pytest.mark.parametrize("values", [
+    {"G": "abc", "H": 1, "K": 1},
+    {"G": [1, "x"], "H": 1, "K": 1},
+    {"G": [1, 2], "H": [1, 2, 3], "K": 1},
+    {"G": [], "H": 1, "K": 1},
+    [1, 2, 3],
+])
+def test_bad_values_are_a_bad_request(values):
+    with pytest.raises(ValueError):
+        mason.evaluate_transfer_function("G*H", "1 + H*K", values)
+    # Checked before the analysis runs, and again for a cached one
+    client = app.test_client()
+    assert client.post("/analyze", json=GRAPH).status_code == 200
+    assert client.post("/analyze", json=dict(GRAPH, values=values)).status_code == 400
@@ -0,0 +1,39 @@
+import pytest
+
+import mason
+from SignalFlowGraphCalc import ANALYSIS_CACHE, app
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+GRAPH = {
+    "nodes": [{"id": node} for node in ("S1", "S2", "S3", "S4")],
+    "edges": [edge("S1", "S2", "G"), edge("S2", "S3", "H"), edge("S3", "S4", "F"),
+              edge("S3", "S2", "-K"), edge("S1", "S4", "D")],
+    "sourceNode": "S1",
+    "destNode": "S4",
+}
+
+def test_limits_are_coerced():
+    limits = mason.EnumerationLimits.from_request({"max_paths": "3", "max_loops": 2.0, "deadline": "0.5"})
+    assert (limits.max_paths, limits.max_loops) == (3, 2)
+    assert mason.EnumerationLimits.from_request({}) is None
+
+@pytest.mark.parametrize("field, value", [("max_paths", "abc"), ("max_loops", -1),
+                                          ("deadline", [1]), ("deadline", "nan")])
+def test_bad_limits_are_a_bad_request(field, value):
+    response = app.test_client().post("/analyze", json=dict(GRAPH, **{field: value}))
+    assert response.status_code == 400
+    assert field in response.get_json()["error"]
+
+def test_max_paths_given_as_a_string():
+    ANALYSIS_CACHE.clear()
+    response = app.test_client().post("/analyze", json=dict(GRAPH, max_paths="1"))
+    assert response.status_code == 200
+    assert response.get_json()["result"]["truncated"] == {"paths": "limit"}
+
+def test_zero_deadline_is_not_unset():
+    ANALYSIS_CACHE.clear()
+    response = app.test_client().post("/analyze", json=dict(GRAPH, deadline=0))
+    assert response.status_code == 200
+    assert response.get_json()["result"]["truncated"] == {"paths": "deadline", "loops": "deadline"}
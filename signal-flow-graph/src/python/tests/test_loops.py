@@ -0,0 +1,71 @@
+import random
+from itertools import product
+
+import networkx as nx
+import pytest
+import sympy as sp
+
+import mason
+
+def random_graph(seed, node_count=6, edge_count=12):
+    """Nodes, and edges that include parallel edges and self-loops"""
+    rng = random.Random(seed)
+    names = [f"N{i}" for i in range(node_count)]
+    edges = [{"source": rng.choice(names), "target": rng.choice(names), "label": f"g{i}"}
+             for i in range(edge_count)]
+    edges.append(dict(edges[0], label="p0"))  # parallel to edge_0
+    edges.append({"source": names[0], "target": names[0], "label": "s0"})
+    edges.append({"source": names[0], "target": names[0], "label": "s1"})
+    return [{"id": name} for name in names], edges
+
+def reference_loops(G):
+    """Edge-id sets of every elementary loop: networkx's node cycles expanded over parallel edges"""
+    index = mason.graph_index(G)
+    ids = {}
+    for edge_id, (u, v, _) in index.edges.items():
+        ids.setdefault((u, v), []).append(edge_id)
+    loops = set()
+    for cycle in nx.simple_cycles(nx.DiGraph(G)):
+        steps = [ids[(cycle[i], cycle[(i + 1) % len(cycle)])] for i in range(len(cycle))]
+        loops.update(frozenset(choice) for choice in product(*steps))
+    return loops
+
+def reference_determinant(loops, gains):
+    """Δ and its L1, L2, ... expression summed over every set of pairwise non-touching loops"""
+    nodes = [set(loop) for loop in loops]
+    groups = {}
+
+    def extend(group, start):
+        for j in range(start, len(loops)):
+            if all(nodes[i].isdisjoint(nodes[j]) for i in group):
+                groups.setdefault(len(group) + 1, []).append(group + (j,))
+                extend(group + (j,), j + 1)
+
+    extend((), 0)
+    delta = sp.Integer(1)
+    terms = ["1"]
+    for order in sorted(groups):
+        for group in sorted(groups[order]):
+            delta += (-1) ** order * sp.Mul(*(gains[i] for i in group))
+            terms.append(("+" if order % 2 == 0 else "-") + "*".join(f"L{i + 1}" for i in group))
+    return delta, " ".join(terms)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_each_elementary_loop_once(seed):
+    G = mason.build_graph(*random_graph(seed))
+    loops, loop_edges = mason.find_loop_edges(G)
+    assert len(loop_edges) == len({frozenset(edge_ids) for edge_ids in loop_edges})
+    assert {frozenset(edge_ids) for edge_ids in loop_edges} == reference_loops(G)
+    for loop, edge_ids in zip(loops, loop_edges):
+        assert loop[0] == loop[-1] == min(loop) and len(loop) == len(edge_ids) + 1
+
+@pytest.mark.parametrize("seed", range(20))
+def test_determinant_matches_brute_force(seed):
+    G = mason.build_graph(*random_graph(seed))
+    loops, gains = mason.find_unique_loops(G)
+    mapping = {i: f"L{i + 1}" for i in range(len(loops))}
+    model = mason.LoopInteractionModel(G, loops, gains)
+    determinant = mason.calculate_determinant(G, loops, mapping, model=model)
+    expected, expression = reference_determinant(loops, gains)
+    assert determinant["expression"] == expression
+    assert sp.expand(determinant["numeric_value"] - expected) == 0
@@ -0,0 +1,35 @@
+import pytest
+
+import mason
+from SignalFlowGraphCalc import app
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+# No S4, which is the default destNode
+GRAPH = {
+    "nodes": [{"id": node} for node in ("S1", "S2", "S3")],
+    "edges": [edge("S1", "S2", "G"), edge("S2", "S3", "H"), edge("S3", "S2", "-K")],
+}
+
+@pytest.mark.parametrize("engine", ["mason", "elimination"])
+@pytest.mark.parametrize("source, sink", [("S1", "S4"), ("S9", "S3"), ("S9", "S9")])
+def test_missing_source_or_sink_has_no_forward_paths(engine, source, sink):
+    payload = dict(GRAPH, sourceNode=source, destNode=sink, engine=engine)
+    response = app.test_client().post("/analyze", json=payload)
+    assert response.status_code == 200
+    result = response.get_json()["result"]
+    assert result["forward_paths"] == []
+    assert result["transfer_function"]["numeric_value"] == "0"
+    assert result["determinant"]["numeric_value"] == "H*K + 1"
+
+def test_default_sink_in_batch_and_sessions():
+    assert mason.analyze_one(dict(GRAPH, sourceNode="S1"))["result"]["transfer_function"]["numeric_value"] == "0"
+    client = app.test_client()
+    response = client.post("/sessions", json=dict(GRAPH, sourceNode="S1"))
+    assert response.status_code == 201
+    session_id = response.get_json()["session_id"]
+    response = client.patch(f"/sessions/{session_id}/edges",
+                            json={"op": "add", "source": "S1", "target": "S3", "label": "F"})
+    assert response.status_code == 200
+    assert response.get_json()["result"]["transfer_function"]["numeric_value"] == "0"
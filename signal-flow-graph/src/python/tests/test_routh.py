@@ -0,0 +1,52 @@
+import pytest
+
+from routh import routh_sweep, routh_table
+
+def test_stable_cubic():
+    result = routh_table(["1", "2", "3", "1"])
+    assert result["first_column"] == ["1", "2", "5/2", "1"]
+    assert result["stable"] is True
+    assert result["lhp_roots"] == 3
+
+def test_all_zero_row_counts_jw_roots():
+    # s^3 + s^2 + 2s + 2 = (s + 1)(s^2 + 2)
+    result = routh_table(["1", "1", "2", "2"])
+    assert result["special_cases"][0]["case"] == "all_zero_row"
+    assert (result["rhp_roots"], result["jw_roots"], result["lhp_roots"]) == (0, 2, 1)
+    assert result["marginally_stable"] is True
+
+def test_right_half_plane_roots():
+    # (s - 1)(s + 2) = s^2 + s - 2
+    result = routh_table(["1", "1", "-2"])
+    assert result["rhp_roots"] == 1
+    assert result["stable"] is False
+
+def test_symbolic_gain_range():
+    assert routh_table(["1", "3", "2", "K"])["stable_range"] == "Interval.open(0, 6)"
+
+def test_sweep_matches_the_exact_range():
+    result = routh_sweep(["1", "3", "2", "K"], {"K": [-1, 1, 5, 7]})
+    assert result["stable"] == [False, True, True, False]
+    assert result["stable_ranges"] == {"K": [[1.0, 5.0]]}
+
+@pytest.mark.parametrize("coefficients, counts", [
+    # A zero first element and jω roots together:
+    # (s^2 + 9)(s + 2)(s^2 - 2s + 2) and (s^2 + 1)(s - 2)(s^2 + 2s + 2)
+    ([1, 0, 7, 4, -18, 36], (2, 2, 1)),
+    ([1, 0, -1, -4, -2, -4], (1, 2, 2)),
+    # s^2 (s + 1)^2: a double root at 0
+    ([1, 2, 1, 0, 0], (0, 2, 2)),
+])
+def test_zero_first_element_with_jw_roots(coefficients, counts):
+    result = routh_table(coefficients)
+    assert (result["rhp_roots"], result["jw_roots"], result["lhp_roots"]) == counts
+    sweep = routh_sweep(coefficients, {})
+    assert (sweep["rhp_roots"], sweep["jw_roots"]) == ([counts[0]], [counts[1]])
+
+def test_sweep_range_needs_start_and_stop():
+    with pytest.raises(ValueError):
+        routh_sweep(["1", "K"], {"K": {"num": 3}})
+
+def test_empty_polynomial_is_rejected():
+    with pytest.raises(ValueError):
+        routh_table(["0", "0"])
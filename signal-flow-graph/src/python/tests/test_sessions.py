@@ -0,0 +1,51 @@
+import pytest
+
+from SignalFlowGraphCalc import app
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+GRAPH = {
+    "nodes": [{"id": node} for node in ("S1", "S2", "S3", "S4")],
+    "edges": [edge("S1", "S2", "G"), edge("S2", "S3", "H"), edge("S3", "S4", "F"), edge("S3", "S2", "-K")],
+    "sourceNode": "S1",
+    "destNode": "S4",
+}
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+@pytest.mark.parametrize("payload", [
+    dict(GRAPH, edges=GRAPH["edges"] + [edge("S1", "S4", "1 +")]),  # label does not parse
+    dict(GRAPH, edges=GRAPH["edges"] + [{"source": "S1", "label": "D"}]),  # no target
+    ["not", "an", "object"],
+])
+def test_bad_session_is_a_bad_request(client, payload):
+    assert client.post("/sessions", json=payload).status_code == 400
+
+def test_failed_edit_list_is_rolled_back(client):
+    response = client.post("/sessions", json=GRAPH)
+    session_id = response.get_json()["session_id"]
+    before = response.get_json()["result"]
+
+    edits = [
+        {"op": "update", "id": "edge_0", "label": "2*G"},
+        {"op": "add", "source": "S1", "target": "S4", "label": "D"},
+        {"op": "remove", "id": "edge_3"},
+        {"op": "update", "id": "edge_1", "label": "1 +"},
+    ]
+    response = client.patch(f"/sessions/{session_id}/edges", json={"edits": edits})
+    assert response.status_code == 400
+    assert client.get(f"/sessions/{session_id}").get_json()["result"] == before
+
+    # The session still works, and edge ids are handed out as if nothing happened
+    response = client.patch(f"/sessions/{session_id}/edges", json={"edits": edits[:3]})
+    assert response.status_code == 200
+    assert response.get_json()["added_edges"] == ["edge_4"]
+    fresh = client.post("/sessions", json=dict(GRAPH, edges=[
+        edge("S1", "S2", "2*G"), edge("S2", "S3", "H"), edge("S3", "S4", "F"), edge("S1", "S4", "D"),
+    ])).get_json()["result"]
+    result = response.get_json()["result"]
+    assert result["transfer_function"] == fresh["transfer_function"]
+    assert result["determinant"] == fresh["determinant"]
@@ -0,0 +1,37 @@
+import pytest
+
+import mason
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+NODES = [{"id": node} for node in ("R", "Y", "A", "B")]
+
+# R -> Y through a stable block, and apart from it an unstable loop A <-> B:
+# Δ = (s - 1)/(s + 1) never reaches T, but the system still has poles -3 and 1
+HIDDEN_MODE = [edge("R", "Y", "1/(s+3)"), edge("A", "B", "2/(s+1)"), edge("B", "A", "1")]
+
+@pytest.mark.parametrize("engine", ["mason", "elimination"])
+@pytest.mark.parametrize("fast", [False, True])
+def test_characteristic_polynomial_keeps_modes_cancelled_from_t(engine, fast):
+    result = mason.analyze_graph(NODES, HIDDEN_MODE, "R", "Y", engine=engine, fast=fast, stability=True)
+    assert result["stability"]["characteristic_polynomial"] == "s**2 + 2*s - 3"
+    assert result["stability"]["routh"]["rhp_roots"] == 1
+
+@pytest.mark.parametrize("engine", ["mason", "elimination"])
+@pytest.mark.parametrize("edges, polynomial", [
+    ([edge("R", "Y", "1/(s-1)")], "s - 1"),
+    # Unity feedback around A <-> Y: T = 1/(2(s - 1)), Δ = 2 has no poles of its own
+    ([edge("R", "A", "1/(s-1)"), edge("A", "Y", "1"), edge("Y", "A", "-1")], "2*s - 2"),
+])
+def test_characteristic_polynomial_keeps_open_loop_poles(engine, edges, polynomial):
+    result = mason.analyze_graph(NODES, edges, "R", "Y", engine=engine, stability=True)
+    assert result["stability"]["characteristic_polynomial"] == polynomial
+    assert result["stability"]["routh"]["stable"] is False
+
+def test_no_forward_paths_keeps_the_determinant():
+    edges = [edge("A", "Y", "1"), edge("A", "A", "-2/(s+1)")]
+    result = mason.analyze_graph(NODES, edges, "R", "Y", stability=True)
+    assert result["transfer_function"]["numeric_value"] == "0"
+    assert result["stability"]["characteristic_polynomial"] == "s + 3"
+    assert result["stability"]["routh"]["stable"] is True
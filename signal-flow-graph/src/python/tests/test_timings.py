@@ -0,0 +1,18 @@
+import time
+
+import mason
+
+def edge(source, target, label):
+    return {"source": source, "target": target, "label": label}
+
+def test_enumeration_stages_exclude_the_consumer():
+    nodes = [{"id": node} for node in ("s", "a", "t")]
+    edges = [edge("s", "a", "1"), edge("a", "t", "G"), edge("t", "a", "-H"), edge("s", "t", "K")]
+    timings = mason.StageTimings()
+    with timings.activate():
+        for kind, _ in mason.iter_analysis(nodes, edges, "s", "t", engine="mason"):
+            if kind in ("path", "loop"):
+                time.sleep(0.2)  # a slow stream client
+    stages = timings.as_dict()["stages_ms"]
+    assert stages["path_enumeration"] < 200
+    assert stages["loop_enumeration"] < 200
@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+import time
+
+from SignalFlowGraphCalc import WorkerPool
+
+def live_workers(pids):
+    return {process.pid for process in multiprocessing.active_children()} & pids
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+def test_workers_are_started_and_counted():
+    pool = WorkerPool()
+    executor = pool.get(2)
+    assert executor.max_workers == 2
+    assert executor.submit(os.getpid).result(timeout=30) in executor.worker_pids()
+    assert wait_until(lambda: len(executor.worker_pids()) == 2)
+    pool.retire(executor, grace=0)
+
+def test_retire_lets_in_flight_work_finish():
+    pool = WorkerPool()
+    executor = pool.get(2)
+    running = executor.submit(time.sleep, 1)
+    pool.retire(executor, grace=10)
+    assert pool.get(2) is not executor
+    assert running.result(timeout=10) is None
+    assert executor.pending() == []
+    pool.retire(pool.get(2), grace=0)
+
+def test_retire_stops_stuck_workers_after_the_grace_period():
+    pool = WorkerPool()
+    executor = pool.get(1)
+    executor.submit(time.sleep, 60)
+    assert wait_until(lambda: executor.worker_pids())
+    pids = executor.worker_pids()
+    pool.retire(executor, grace=0.5)
+    assert wait_until(lambda: not live_workers(pids))